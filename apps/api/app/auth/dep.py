@@ -1,18 +1,42 @@
-import os, jwt
-from fastapi import Header, HTTPException
+from __future__ import annotations
+import time
 from typing import Optional
+from fastapi import Header, HTTPException
+from app.auth.jwt import verify_token
+from app.config import settings
+from app.utils.lru import TTLCache
+
+class User:
+    __slots__ = ("id",)
 
-JWT_SECRET = os.getenv("JWT_SECRET", "devsecret")
+    def __init__(self, id: str):
+        self.id = id
 
-def get_current_user(authorization: Optional[str] = Header(None)):
+# doğrulanmış token -> (User, exp). exp'i geçen girdi kullanılmaz; exp'siz
+# (eski) token'lar cache'lenmez, her seferinde doğrulanır.
+_verified: TTLCache[tuple[User, int]] = TTLCache(settings.AUTH_CACHE_SIZE)
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> User:
+    # async: saf CPU işi, sync dependency gibi threadpool'a gitmesin
     if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing token")
-    token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-    except jwt.PyJWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
+        raise HTTPException(401, "Missing token")
+    token = authorization[7:]
+
+    hit = _verified.get(token)
+    if hit is not None:
+        user, exp = hit
+        if exp > time.time():
+            return user
+        _verified.pop(token)
+
+    payload = verify_token(token)
+    if payload is None:
+        raise HTTPException(401, "Invalid token")
     uid = payload.get("sub")
     if not uid:
-        raise HTTPException(status_code=401, detail="Invalid token payload")
-    return type("User", (), {"id": uid})
\ No newline at end of file
+        raise HTTPException(401, "Invalid token payload")
+    user = User(uid)
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        _verified.put(token, (user, int(exp)))
+    return user
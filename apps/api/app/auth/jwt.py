@@ -1,7 +1,17 @@
-import os, time, jwt
-JWT_SECRET = os.getenv("JWT_SECRET", "devsecret")
+from __future__ import annotations
+import time, jwt
+from typing import Any, Dict
+from app.config import settings
 
-def create_token(user_id: str, ttl_sec: int = 60*60*24*30):
+def create_token(user_id: str, ttl_sec: int | None = None) -> str:
     now = int(time.time())
-    payload = {"sub": user_id, "iat": now, "exp": now + ttl_sec}
-    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
\ No newline at end of file
+    ttl = settings.JWT_TTL_SEC if ttl_sec is None else ttl_sec
+    payload = {"sub": user_id, "iat": now, "exp": now + ttl}
+    return jwt.encode(payload, settings.JWT_SECRET, algorithm="HS256")
+
+def verify_token(token: str) -> Dict[str, Any] | None:
+    """İmza + exp kontrolü; geçersizse None."""
+    try:
+        return jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
+    except jwt.PyJWTError:
+        return None
@@ -0,0 +1,36 @@
+from __future__ import annotations
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+from passlib.hash import bcrypt
+from app.config import settings
+from app.utils import metrics
+
+# bcrypt'e ayrılmış, sınırlı havuz: login fırtınası Starlette'in ortak
+# threadpool'unu (sync endpoint'ler, DB) aç bırakmasın. bcrypt C/Rust tarafında
+# GIL'i bıraktığı için thread'ler gerçekten paralel çalışır.
+_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_POOL_SIZE, thread_name_prefix="bcrypt")
+_hasher = bcrypt.using(rounds=settings.BCRYPT_ROUNDS)
+_limit = settings.PASSWORD_POOL_SIZE + settings.PASSWORD_QUEUE_LIMIT
+_inflight = 0
+
+async def _run(fn, *args):
+    global _inflight
+    if _inflight >= _limit:
+        metrics.inc("auth", op="bcrypt", outcome="busy")
+        raise HTTPException(503, "Auth busy, retry shortly", headers={"Retry-After": "1"})
+    _inflight += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+    finally:
+        _inflight -= 1
+
+async def hash_password(password: str) -> str:
+    return await _run(_hasher.hash, password)
+
+async def verify_password(password: str, password_hash: str) -> bool:
+    # cost hash'in içinden okunur; eski rounds ile üretilmiş hash'ler de doğrulanır
+    return await _run(bcrypt.verify, password, password_hash)
+
+def shutdown() -> None:
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,17 +1,15 @@
 from __future__ import annotations
-import os, jwt, uuid
+import os, uuid
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr
-from passlib.hash import bcrypt
 from sqlalchemy import text
-from app.db.base import SessionLocal
-from app.config import settings
+from app.db.base import AsyncSessionLocal
+from app.auth.jwt import create_token
+from app.auth.passwords import hash_password, verify_password
+from app.utils import metrics
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-def create_token(sub: str) -> str:
-    return jwt.encode({"sub": sub}, settings.JWT_SECRET, algorithm="HS256")
-
 class RegisterIn(BaseModel):
     email: EmailStr
     password: str
@@ -20,18 +18,20 @@ class TokenOut(BaseModel):
     token: str
 
 @router.post("/register", response_model=TokenOut)
-def register(data: RegisterIn):
-    with SessionLocal() as db:
-        phash = bcrypt.hash(data.password)
+async def register(data: RegisterIn):
+    phash = await hash_password(data.password)
+    async with AsyncSessionLocal() as db:
         try:
-            uid = db.execute(text("""
+            uid = (await db.execute(text("""
                 INSERT INTO users (email, password_hash)
                 VALUES (:email, :phash) RETURNING id
-            """), {"email": data.email, "phash": phash}).scalar_one()
-            db.commit()
+            """), {"email": data.email, "phash": phash})).scalar_one()
+            await db.commit()
         except Exception:
-            db.rollback()
+            await db.rollback()
+            metrics.inc("auth", op="register", outcome="conflict")
             raise HTTPException(400, "Email already exists")
+    metrics.inc("auth", op="register", outcome="ok")
     return {"token": create_token(str(uid))}
 
 class LoginIn(BaseModel):
@@ -39,24 +39,28 @@ class LoginIn(BaseModel):
     password: str
 
 @router.post("/login", response_model=TokenOut)
-def login(data: LoginIn):
-    with SessionLocal() as db:
-        row = db.execute(text(
+async def login(data: LoginIn):
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(text(
             "SELECT id, password_hash FROM users WHERE email=:e"
-        ), {"e": data.email}).first()
-        if not row or not bcrypt.verify(data.password, row.password_hash):
-            raise HTTPException(401, "Invalid credentials")
-        return {"token": create_token(str(row.id))}
+        ), {"e": data.email})).first()
+    # DB bağlantısı bcrypt beklerken havuzda tutulmaz
+    if not row or not row.password_hash or not await verify_password(data.password, row.password_hash):
+        metrics.inc("auth", op="login", outcome="invalid")
+        raise HTTPException(401, "Invalid credentials")
+    metrics.inc("auth", op="login", outcome="ok")
+    return {"token": create_token(str(row.id))}
 
 @router.post("/guest", response_model=TokenOut)
-def guest():
+async def guest():
     # anonim kullanıcıyı (varsa) tablodan bul, yoksa oluştur
-    with SessionLocal() as db:
-        uid = db.execute(text("""
+    async with AsyncSessionLocal() as db:
+        uid = (await db.execute(text("""
             INSERT INTO users (email, password_hash)
             VALUES (:email, '')
             ON CONFLICT (email) DO UPDATE SET email = EXCLUDED.email
             RETURNING id
-        """), {"email": "guest@cortexa.local"}).scalar_one()
-        db.commit()
-    return {"token": create_token(str(uid))}
\ No newline at end of file
+        """), {"email": "guest@cortexa.local"})).scalar_one()
+        await db.commit()
+    metrics.inc("auth", op="guest", outcome="ok")
+    return {"token": create_token(str(uid))}
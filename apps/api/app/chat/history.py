@@ -0,0 +1,108 @@
+from __future__ import annotations
+from typing import Dict, List, NamedTuple, Tuple
+from sqlalchemy import text
+from app.db.base import AsyncSessionLocal
+from app.config import settings
+
+# Sunucu tarafı konuşma geçmişi: `conversation_turns` append-only log, `conversations`
+# satırında rolling summary. Prompt'a yalnız özet + özetlenmemiş son turlar girer;
+# özet arka planda artımlı güncellenir, böylece tur başı maliyet sabit kalır.
+
+class Context(NamedTuple):
+    summary: str
+    turns: List[Dict[str, str]]  # eskiden yeniye {"role", "content"}
+
+_CREATE_SQL = text("""
+    INSERT INTO conversations (user_id) VALUES (:uid) RETURNING id
+""")
+
+# tek round-trip: özet + özetlenmemiş kuyruğun son :n turu, (conversation_id, seq) PK'sı ile
+_CONTEXT_SQL = text("""
+    SELECT c.summary, t.role, t.content
+    FROM conversations c
+    LEFT JOIN LATERAL (
+        SELECT seq, role, content FROM conversation_turns
+        WHERE conversation_id = c.id AND seq > c.summarized_upto
+        ORDER BY seq DESC
+        LIMIT :n
+    ) t ON true
+    WHERE c.id = :cid AND c.user_id = :uid
+    ORDER BY t.seq ASC
+""")
+
+_BUMP_SQL = text("""
+    UPDATE conversations SET turn_count = turn_count + :n, updated_at = now()
+    WHERE id = :cid AND user_id = :uid
+    RETURNING turn_count, summarized_upto
+""")
+
+_APPEND_SQL = text("""
+    INSERT INTO conversation_turns (conversation_id, seq, role, content)
+    VALUES (:cid, :seq, :role, :content)
+""")
+
+_PENDING_SQL = text("""
+    SELECT c.summary, c.summarized_upto, t.seq, t.role, t.content
+    FROM conversations c
+    JOIN conversation_turns t ON t.conversation_id = c.id
+    WHERE c.id = :cid AND t.seq > c.summarized_upto AND t.seq <= c.turn_count - :keep
+    ORDER BY t.seq ASC
+""")
+
+# iyimser kilit: aynı konuşma için iki iş yarışırsa yalnız biri yazar
+_SUMMARY_SQL = text("""
+    UPDATE conversations SET summary = :s, summarized_upto = :upto, updated_at = now()
+    WHERE id = :cid AND summarized_upto = :prev
+""")
+
+def summarize_at() -> int:
+    # özetlenmemiş kuyruk bu kadar tura ulaşınca özet işi tetiklenir
+    return settings.CHAT_HISTORY_TURNS + settings.CHAT_SUMMARY_EVERY
+
+def window() -> int:
+    # okuma üst sınırı: özet işi gecikse de bir tur daha payı; prompt kurucu bütçeye göre kırpar
+    return summarize_at() + settings.CHAT_SUMMARY_EVERY
+
+async def create(user_id: str) -> str:
+    async with AsyncSessionLocal() as db:
+        cid = (await db.execute(_CREATE_SQL, {"uid": user_id})).scalar_one()
+        await db.commit()
+    return str(cid)
+
+async def load(user_id: str, conversation_id: str) -> Context | None:
+    """Konuşma bu kullanıcıya ait değilse None."""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_CONTEXT_SQL, {"cid": conversation_id, "uid": user_id, "n": window()})).all()
+    if not rows:
+        return None
+    turns = [{"role": r.role, "content": r.content} for r in rows if r.role is not None]
+    return Context(rows[0].summary or "", turns)
+
+async def append(user_id: str, conversation_id: str, turns: List[Tuple[str, str]]) -> int:
+    """Turları log'a ekler; özetlenmemiş tur sayısını döner (0: konuşma bulunamadı)."""
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(_BUMP_SQL, {"cid": conversation_id, "uid": user_id, "n": len(turns)})).first()
+        if row is None:
+            return 0
+        first = row.turn_count - len(turns) + 1
+        await db.execute(_APPEND_SQL, [
+            {"cid": conversation_id, "seq": first + i, "role": role, "content": content}
+            for i, (role, content) in enumerate(turns)
+        ])
+        await db.commit()
+    return row.turn_count - row.summarized_upto
+
+async def pending(conversation_id: str) -> Tuple[str, int, int, List[Dict[str, str]]]:
+    """(mevcut özet, summarized_upto, yeni upto, özete katılacak turlar)."""
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(_PENDING_SQL, {"cid": conversation_id, "keep": settings.CHAT_HISTORY_TURNS})).all()
+    if not rows:
+        return "", 0, 0, []
+    return (rows[0].summary or "", rows[0].summarized_upto, rows[-1].seq,
+            [{"role": r.role, "content": r.content} for r in rows])
+
+async def save_summary(conversation_id: str, summary: str, prev: int, upto: int) -> bool:
+    async with AsyncSessionLocal() as db:
+        res = await db.execute(_SUMMARY_SQL, {"cid": conversation_id, "s": summary, "prev": prev, "upto": upto})
+        await db.commit()
+    return res.rowcount == 1
@@ -0,0 +1,104 @@
+from __future__ import annotations
+import math
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from app.config import settings
+from app.memory.repo import Memory
+
+# Token bütçeli prompt kurucu: recall edilen hafızalar benzerlik/skor/yeniliğe
+# göre sıralanır, bütçeye sığanlar (gerekirse kırpılarak) sisteme eklenir.
+# Konuşma varsa özet ve son turlar hafızalardan önce bütçeden pay alır.
+
+CHAT_PREAMBLE = (
+    "You are Cortexa. If relevant, use the user's stored context.\n"
+    "User context:\n"
+)
+SUMMARY_HEADER = "\n\nConversation so far (summary):\n"
+_MSG_OVERHEAD = 4  # chat formatında mesaj başına rol/ayraç token'ları
+
+def estimate_tokens(text: str) -> int:
+    # tokenizer'sız hızlı tahmin; Türkçe/İngilizce karışık metinde ~3.5 char/token
+    return math.ceil(len(text) / settings.PROMPT_CHARS_PER_TOKEN) if text else 0
+
+@lru_cache(maxsize=8)
+def _preamble_tokens(preamble: str) -> int:
+    return estimate_tokens(preamble) + _MSG_OVERHEAD
+
+def _recency(m: Memory, now: datetime) -> float:
+    ts = m.created_at
+    seen = (m.meta or {}).get("last_seen")
+    if isinstance(seen, str):
+        try:
+            ts = max(ts, datetime.fromisoformat(seen)) if ts else datetime.fromisoformat(seen)
+        except (TypeError, ValueError):
+            pass
+    if ts is None:
+        return 0.5
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    age_days = max(0.0, (now - ts).total_seconds() / 86400)
+    return math.exp(-age_days / settings.PROMPT_RECENCY_DAYS)
+
+def rank(mems: List[Memory], max_dist: float) -> List[Memory]:
+    now = datetime.now(timezone.utc)
+
+    def _score(m: Memory) -> float:
+        sim = max(0.0, 1 - m.dist / max_dist) if m.dist is not None and max_dist > 0 else 0.5
+        conf = float((m.meta or {}).get("score", 0.5))
+        return 0.6 * sim + 0.25 * conf + 0.15 * _recency(m, now)
+
+    return sorted(mems, key=_score, reverse=True)
+
+def _trim(text: str, max_tokens: int) -> str:
+    max_chars = int(max_tokens * settings.PROMPT_CHARS_PER_TOKEN)
+    return text if len(text) <= max_chars else text[: max(0, max_chars - 1)].rstrip() + "…"
+
+def build(message: str, mems: List[Memory], max_dist: float,
+          preamble: str = CHAT_PREAMBLE, budget: int | None = None,
+          summary: str = "", turns: List[dict] | None = None) -> Tuple[List[dict], List[str], Dict[str, int]]:
+    """
+    DÖNÜŞ: (messages, kullanılan hafıza metinleri, {"prompt_tokens", "memories_dropped", "history_turns"}).
+    Bütçe: sistem preamble + kullanıcı mesajı sabit; sonra konuşma özeti ve son turlar
+    (yeniden eskiye, kesintisiz), kalan pay hafızalara.
+    """
+    budget = settings.PROMPT_TOKEN_BUDGET if budget is None else budget
+    fixed = _preamble_tokens(preamble) + estimate_tokens(message) + _MSG_OVERHEAD
+    left = budget - fixed
+
+    history = 0  # özet + son turların token'ı
+    summary_block = ""
+    if summary:
+        summary_block = SUMMARY_HEADER + _trim(summary, settings.PROMPT_SUMMARY_MAX_TOKENS)
+        cost = estimate_tokens(summary_block)
+        if cost > left - history:
+            summary_block = ""
+        else:
+            history += cost
+    recent: List[dict] = []
+    for t in reversed(turns or []):
+        cost = estimate_tokens(t["content"]) + _MSG_OVERHEAD
+        if cost > left - history:
+            break
+        recent.append({"role": t["role"], "content": t["content"]})
+        history += cost
+    recent.reverse()
+    left -= history
+
+    used: List[str] = []
+    for m in rank(mems, max_dist):
+        line = "- " + _trim(m.content, settings.PROMPT_MEMORY_MAX_TOKENS)
+        cost = estimate_tokens(line) + 1
+        if cost > left:
+            continue
+        used.append(line[2:])
+        left -= cost
+    block = "\n".join(f"- {u}" for u in used) if used else "- (no memory)"
+    messages = [
+        {"role": "system", "content": preamble + block + summary_block},
+        *recent,
+        {"role": "user", "content": message},
+    ]
+    stats = {"prompt_tokens": fixed + history + estimate_tokens(block),
+             "memories_dropped": len(mems) - len(used), "history_turns": len(recent)}
+    return messages, used, stats
@@ -1,114 +1,216 @@
 from __future__ import annotations
 
-import os, jwt, httpx, asyncio, logging, json
-from fastapi import APIRouter, Depends, Header, HTTPException
+import os, asyncio, logging, json, time
+from uuid import UUID
+from typing import AsyncIterator
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.memory.repo import search_memories, upsert_memory
+from app.memory.repo import Memory, search_memories_async, upsert_memories_async
+from app.chat import prompt, history
+from app.auth.dep import get_current_user
+from app.memory.embeddings import embed_texts
+from app.memory.extract import extract_facts, gate as extract_gate
+from app.upstream import client as upstream
+from app.jobs import queue as jobs
+from app.utils.logging import timed
+from app.utils import metrics
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/chat", tags=["chat"])
 
-def get_current_user(authorization: str = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(401, "Missing token")
-    token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-    except jwt.PyJWTError:
-        raise HTTPException(401, "Invalid token")
-    uid = payload.get("sub")
-    if not uid:
-        raise HTTPException(401, "Invalid token payload")
-    return type("User", (), {"id": uid})
-
 async def embed_text(text_in: str) -> list[float]:
     if not settings.OPENAI_API_KEY:
         raise HTTPException(500, "OPENAI_API_KEY missing")
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(
-            f"{settings.OPENAI_API_BASE}/embeddings",
-            headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
-            json={"model": settings.OPENAI_EMBED_MODEL, "input": text_in},
-        )
-        r.raise_for_status()
-        return r.json()["data"][0]["embedding"]
+    return (await embed_texts([text_in]))[0]
 
-async def chat_completion(messages: list[dict], temperature: float = 0.3) -> str:
+async def chat_completion(messages: list[dict], temperature: float = 0.3, model: str | None = None) -> str:
     if not settings.OPENAI_API_KEY:
         raise HTTPException(500, "OPENAI_API_KEY missing")
-    async with httpx.AsyncClient(timeout=120) as client:
-        r = await client.post(
-            f"{settings.OPENAI_API_BASE}/chat/completions",
-            headers={"Authorization": f"Bearer {settings.OPENAI_API_KEY}"},
-            json={"model": settings.OPENAI_MODEL, "messages": messages, "temperature": temperature},
+    with timed("llm"), metrics.timer("completion_seconds"):
+        r = await upstream.post(
+            "/chat/completions",
+            json={"model": model or settings.OPENAI_MODEL, "messages": messages, "temperature": temperature},
+            timeout=120,
         )
-        r.raise_for_status()
-        return r.json()["choices"][0]["message"]["content"]
-
-async def extract_facts(text_in: str) -> list[dict]:
-    prompt = (
-        "Metinden kullanici hakkinda KISA ve kalici olabilecek gercekler cikar.\n"
-        "JSON liste don: [{'kind':'profile|preference|note','content':'...','score':0..1}, ...]\n"
-        f"Metin: {text_in}"
-    )
-    msg = [{"role": "system", "content": "You extract short user facts."},
-           {"role": "user", "content": prompt}]
-    try:
-        out = await chat_completion(msg, temperature=0.1)
-        facts = json.loads(out)
-        return facts if isinstance(facts, list) else []
-    except Exception as e:
-        logger.warning(f"[extract_facts] fallback: {e}")
-        return []
+    return r.json()["choices"][0]["message"]["content"]
+
+async def chat_completion_stream(messages: list[dict], temperature: float = 0.3) -> AsyncIterator[str]:
+    """Upstream `stream: true` SSE gövdesinden içerik parçalarını sırayla verir."""
+    if not settings.OPENAI_API_KEY:
+        raise HTTPException(500, "OPENAI_API_KEY missing")
+    body = {"model": settings.OPENAI_MODEL, "messages": messages,
+            "temperature": temperature, "stream": True}
+    with timed("llm"), metrics.timer("completion_seconds"):
+        async with upstream.stream("/chat/completions", json=body, timeout=120) as r:
+            async for line in r.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                delta = (choices[0].get("delta") or {}).get("content") if choices else None
+                if delta:
+                    yield delta
 
 class ChatIn(BaseModel):
     message: str
+    # geçmiş opt-in: conversation_id ile devam edilir, new_conversation=true yeni konuşma
+    # açar (id cevapta döner); ikisi de yoksa istek durumsuzdur, hiçbir şey yazılmaz
+    conversation_id: UUID | None = None
+    new_conversation: bool = False
+    # recall'u bu hafıza türleriyle sınırla (ör. ["profile", "preference"])
+    kinds: list[str] | None = None
+
+async def _recall(user_id: str, message: str, kinds: list[str] | None = None) -> list[Memory]:
+    with timed("recall"):
+        with timed("embed"):
+            qemb = await embed_text(message)
+        # hybrid: mesajdaki tam token'lar (isim, yaş, şirket) vektörde kaçsa da full-text'ten gelir
+        mems = await search_memories_async(user_id, qemb, k=settings.RECALL_K, max_dist=settings.RECALL_MAX_DIST,
+                                           kinds=kinds, query_text=message)
+    logger.info(f"[chat] uid={user_id} recall={len(mems)} preview={[m.content for m in mems[:2]]}")
+    return mems
+
+_NO_HISTORY = history.Context("", [])
+
+async def _conversation(user_id: str, payload: ChatIn) -> tuple[str | None, history.Context]:
+    conversation_id = payload.conversation_id
+    if conversation_id is None:
+        if not payload.new_conversation:
+            return None, _NO_HISTORY
+        return await history.create(user_id), _NO_HISTORY
+    ctx = await history.load(user_id, str(conversation_id))
+    if ctx is None:
+        raise HTTPException(404, "conversation not found")
+    return str(conversation_id), ctx
+
+def _build_messages(user_id: str, message: str, mems: list[Memory],
+                    ctx: history.Context) -> tuple[list[dict], list[str], dict]:
+    messages, used, st = prompt.build(message, mems, settings.RECALL_MAX_DIST,
+                                      summary=ctx.summary, turns=ctx.turns)
+    metrics.observe("prompt_tokens", st["prompt_tokens"])
+    logger.info(f"[chat] uid={user_id} prompt_tokens~{st['prompt_tokens']} "
+                f"dropped={st['memories_dropped']} history={st['history_turns']}")
+    return messages, used, st
+
+async def _record_turns(user_id: str, conversation_id: str | None, message: str, reply: str) -> None:
+    if conversation_id is None:
+        return
+    unsummarized = await history.append(user_id, conversation_id, [("user", message), ("assistant", reply)])
+    # kuyruk son turların ötesine taşınca özet arka planda ilerler
+    if unsummarized >= history.summarize_at():
+        await jobs.submit("summarize", {"conversation_id": conversation_id})
+
+SUMMARY_PROMPT = (
+    "You maintain a running summary of a conversation between a user and an assistant. "
+    "Merge the new turns into the existing summary. Keep facts, decisions, open questions "
+    "and the user's preferences; drop small talk. Reply with the updated summary only, "
+    "at most 150 words, in the conversation's language."
+)
+
+@jobs.handler("summarize")
+async def _summarize(conversation_id: str):
+    # artımlı: yalnız özetlenmemiş ve son pencerenin dışında kalan turlar modele gider
+    summary, prev, upto, turns = await history.pending(conversation_id)
+    if not turns:
+        return
+    log = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    new = await chat_completion([
+        {"role": "system", "content": SUMMARY_PROMPT},
+        {"role": "user", "content": f"Current summary:\n{summary or '(empty)'}\n\nNew turns:\n{log}"},
+    ], temperature=0.0, model=settings.OPENAI_EXTRACT_MODEL)
+    ok = await history.save_summary(conversation_id, new.strip(), prev, upto)
+    logger.info(f"[summary] conv={conversation_id} upto={upto} turns={len(turns)} saved={ok}")
+
+@jobs.handler("auto_memory")
+async def _auto_store(user_id: str, message: str):
+    # hata yukarı çıkar: kuyruk `failed` sayar, pg modunda tekrar dener
+    facts = await extract_facts(message, gated=True)
+    filtered = []
+    for f in facts:
+        content = (f or {}).get("content", "").strip()
+        if len(content) < 10:
+            continue
+        score = float((f or {}).get("score", 0))
+        if score < settings.AUTO_MEMORY_MIN_SCORE:
+            continue
+        kind = (f or {}).get("kind") or "note"
+        filtered.append({"kind": kind, "content": content, "score": score})
+    if not filtered:
+        return
+    # tek batched embedding çağrısı + tek transaction'da dedupe'lu upsert
+    embs = await embed_texts([it["content"] for it in filtered])
+    res = await upsert_memories_async(user_id, [
+        {"kind": it["kind"], "content": it["content"], "emb": emb,
+         "meta": {"source": "auto", "score": it["score"]}}
+        for it, emb in zip(filtered, embs)
+    ])
+    logger.info(f"[auto-mem] uid={user_id} stored={res['inserted']} merged={res['merged']}")
+
+async def _submit_auto_memory(user_id: str, message: str) -> None:
+    # sinyalsiz mesaj ("ok", "teşekkürler") kuyruğa bile girmez
+    if extract_gate(message):
+        await jobs.submit("auto_memory", {"user_id": user_id, "message": message})
 
 @router.post("/complete")
 async def complete(payload: ChatIn, user=Depends(get_current_user)):
-    # recall
-    qemb = await embed_text(payload.message)
-    mems = [c for c, _ in search_memories(user.id, qemb, k=8, max_dist=settings.RECALL_MAX_DIST)]
-    logger.info(f"[chat] uid={user.id} recall={len(mems)} preview={mems[:2]}")
-
-    memory_block = "\n".join(f"- {m}" for m in mems) if mems else "- (no memory)"
-    system = (
-        "You are Cortexa. If relevant, use the user's stored context.\n"
-        "User context:\n" + memory_block
+    (cid, ctx), mems = await asyncio.gather(
+        _conversation(user.id, payload),
+        _recall(user.id, payload.message, payload.kinds),
     )
-    messages = [
-        {"role": "system", "content": system},
-        {"role": "user", "content": payload.message},
-    ]
-
+    messages, used, st = _build_messages(user.id, payload.message, mems, ctx)
     reply = await chat_completion(messages, temperature=0.3)
+    await _record_turns(user.id, cid, payload.message, reply)
+
+    # auto memory: sınırlı arka plan kuyruğu (doluysa düşer, cevabı bekletmez)
+    await _submit_auto_memory(user.id, payload.message)
+    return {"reply": reply, "conversation_id": cid, "memories_used": used, "prompt_tokens": st["prompt_tokens"]}
 
-    # auto memory (fire-and-forget)
-    async def _auto_store():
+def _sse(data: dict, event: str | None = None) -> str:
+    head = f"event: {event}\n" if event else ""
+    return head + "data: " + json.dumps(data, ensure_ascii=False) + "\n\n"
+
+@router.post("/complete/stream")
+async def complete_stream(payload: ChatIn, user=Depends(get_current_user)):
+    """
+    SSE: önce `meta` olayı (conversation_id, memories_used), sonra `data: {"delta": ...}`
+    parçaları, en sonda `done` (ya da `error`).
+    """
+    # auto memory kuyruğa en başta girer; recall ve üretimle paralel işlenir
+    await _submit_auto_memory(user.id, payload.message)
+
+    async def events():
         try:
-            facts = await extract_facts(payload.message)
-            filtered = []
-            for f in facts:
-                content = (f or {}).get("content", "").strip()
-                if len(content) < 10:
-                    continue
-                score = float((f or {}).get("score", 0))
-                if score < settings.AUTO_MEMORY_MIN_SCORE:
-                    continue
-                kind = (f or {}).get("kind") or "note"
-                filtered.append({"kind": kind, "content": content, "score": score})
-            if not filtered:
-                return
-            embs = await asyncio.gather(*[embed_text(it["content"]) for it in filtered])
-            for it, emb in zip(filtered, embs):
-                upsert_memory(
-                    user.id, it["kind"], it["content"], emb,
-                    {"source": "auto", "score": it["score"]}
-                )
-            logger.info(f"[auto-mem] uid={user.id} stored={len(filtered)}")
+            # başlıklar istemciye gitmişken recall burada koşar
+            t0 = time.perf_counter()
+            (cid, ctx), mems = await asyncio.gather(
+                _conversation(user.id, payload),
+                _recall(user.id, payload.message, payload.kinds),
+            )
+            messages, used, st = _build_messages(user.id, payload.message, mems, ctx)
+            yield _sse({"conversation_id": cid, "memories_used": used,
+                        "prompt_tokens": st["prompt_tokens"]}, event="meta")
+            first = True
+            parts: list[str] = []
+            async for delta in chat_completion_stream(messages, temperature=0.3):
+                if first:
+                    metrics.observe("ttft_seconds", time.perf_counter() - t0)
+                    first = False
+                parts.append(delta)
+                yield _sse({"delta": delta})
+            await _record_turns(user.id, cid, payload.message, "".join(parts))
+            yield _sse({}, event="done")
+        except HTTPException as e:
+            yield _sse({"detail": e.detail}, event="error")
         except Exception as e:
-            logger.warning(f"[auto-mem] skip: {e}")
+            logger.warning(f"[chat-stream] uid={user.id} error: {e}")
+            yield _sse({"detail": "upstream error"}, event="error")
 
-    asyncio.create_task(_auto_store())
-    return {"reply": reply, "memories_used": mems}
\ No newline at end of file
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -9,9 +9,117 @@ class Settings:
     OPENAI_API_KEY: str | None = os.getenv("OPENAI_API_KEY")
     OPENAI_API_BASE: str = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
     OPENAI_MODEL: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    OPENAI_EXTRACT_MODEL: str = os.getenv("OPENAI_EXTRACT_MODEL", "gpt-4o-mini")
     OPENAI_EMBED_MODEL: str = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
     JWT_SECRET: str = os.getenv("JWT_SECRET", "devsecret")
+    JWT_TTL_SEC: int = int(os.getenv("JWT_TTL_SEC", str(60 * 60 * 24 * 30)))
+    AUTH_CACHE_SIZE: int = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+    # bcrypt havuzu: dolunca (pool + queue) 503
+    PASSWORD_POOL_SIZE: int = int(os.getenv("PASSWORD_POOL_SIZE", "4"))
+    PASSWORD_QUEUE_LIMIT: int = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+    BCRYPT_ROUNDS: int = int(os.getenv("BCRYPT_ROUNDS", "12"))
     RECALL_MAX_DIST: float = float(os.getenv("RECALL_MAX_DIST", "0.8"))
+    # recall: metric index ile sorguda aynı olmalı (l2 | cosine)
+    RECALL_METRIC: str = os.getenv("RECALL_METRIC", "l2")
+    # ann: HNSW + iterative scan | exact: kullanıcı satırlarında tam tarama | auto: az satırlıda exact
+    RECALL_STRATEGY: str = os.getenv("RECALL_STRATEGY", "auto")
+    RECALL_EXACT_MAX_ROWS: int = int(os.getenv("RECALL_EXACT_MAX_ROWS", "2000"))
+    RECALL_EF_SEARCH: int = int(os.getenv("RECALL_EF_SEARCH", "100"))
+    # recall sonucu cache'i (0: kapalı); yazmalar kullanıcı sürümünü artırıp geçersizler
+    RECALL_CACHE_SIZE: int = int(os.getenv("RECALL_CACHE_SIZE", "10000"))
+    RECALL_CACHE_TTL: float = float(os.getenv("RECALL_CACHE_TTL", "60"))
+    RECALL_CACHE_QUANT: float = float(os.getenv("RECALL_CACHE_QUANT", "100"))
+    RECALL_ITERATIVE_SCAN: str = os.getenv("RECALL_ITERATIVE_SCAN", "strict_order")  # boş: kapalı
+    # kompakt ANN: halfvec (+ opsiyonel Matryoshka kırpma) expression index'i, adaylar tam vektörle yeniden sıralanır
+    RECALL_COMPACT: bool = os.getenv("RECALL_COMPACT", "0") == "1"
+    RECALL_COMPACT_DIMS: int = int(os.getenv("RECALL_COMPACT_DIMS", "1536"))  # 1536: yalnız halfvec
+    RECALL_RESCORE_FACTOR: int = int(os.getenv("RECALL_RESCORE_FACTOR", "4"))  # aday = k * factor
+    # hybrid recall: full-text + vektör, reciprocal-rank fusion (1 / (RRF_K + sıra))
+    RECALL_HYBRID: bool = os.getenv("RECALL_HYBRID", "0") == "1"
+    # yalnız token eşleşmesiyle gelen satırlar için mesafe eşiği = RECALL_MAX_DIST * slack
+    RECALL_LEXICAL_DIST_SLACK: float = float(os.getenv("RECALL_LEXICAL_DIST_SLACK", "1.25"))
+    RECALL_RRF_K: int = int(os.getenv("RECALL_RRF_K", "60"))
+    RECALL_HYBRID_FACTOR: int = int(os.getenv("RECALL_HYBRID_FACTOR", "4"))  # her koldan aday = k * factor
+    RECALL_K: int = int(os.getenv("RECALL_K", "6"))
     AUTO_MEMORY_MIN_SCORE: float = float(os.getenv("AUTO_MEMORY_MIN_SCORE", "0.55"))
+    # fact çıkarımı öncesi yerel kapı: sinyalsiz mesajlar LLM'e gitmez
+    EXTRACT_GATE: bool = os.getenv("EXTRACT_GATE", "1") == "1"
+    # prompt kurucu: hafızalar için token bütçesi ve yerel token tahmini
+    PROMPT_TOKEN_BUDGET: int = int(os.getenv("PROMPT_TOKEN_BUDGET", "1200"))
+    PROMPT_MEMORY_MAX_TOKENS: int = int(os.getenv("PROMPT_MEMORY_MAX_TOKENS", "80"))
+    PROMPT_CHARS_PER_TOKEN: float = float(os.getenv("PROMPT_CHARS_PER_TOKEN", "3.5"))
+    PROMPT_RECENCY_DAYS: float = float(os.getenv("PROMPT_RECENCY_DAYS", "30"))
+    PROMPT_SUMMARY_MAX_TOKENS: int = int(os.getenv("PROMPT_SUMMARY_MAX_TOKENS", "250"))
+    # konuşma geçmişi: prompt'a girecek son tur sayısı ve özet tetikleme eşiği
+    CHAT_HISTORY_TURNS: int = int(os.getenv("CHAT_HISTORY_TURNS", "6"))
+    CHAT_SUMMARY_EVERY: int = int(os.getenv("CHAT_SUMMARY_EVERY", "6"))
+    # toplu import/export (NDJSON)
+    IMPORT_BATCH: int = int(os.getenv("IMPORT_BATCH", "256"))
+    IMPORT_CONCURRENCY: int = int(os.getenv("IMPORT_CONCURRENCY", "4"))
+    IMPORT_MAX_LINE: int = int(os.getenv("IMPORT_MAX_LINE", "65536"))
+    EXPORT_FETCH: int = int(os.getenv("EXPORT_FETCH", "500"))
+    # retention / compaction (python -m app.memory.retention)
+    MEMORY_ACCESS_FLUSH_SEC: float = float(os.getenv("MEMORY_ACCESS_FLUSH_SEC", "10"))  # 0: sayaç yok
+    RETAIN_NOTE_DAYS: float = float(os.getenv("RETAIN_NOTE_DAYS", "90"))
+    RETAIN_MIN_SCORE: float = float(os.getenv("RETAIN_MIN_SCORE", "0.3"))
+    RETAIN_DECAY_DAYS: float = float(os.getenv("RETAIN_DECAY_DAYS", "60"))
+    # L2 cinsinden (birim vektör); RECALL_METRIC=cosine'de repo.metric_dist ile çevrilir
+    COMPACT_MERGE_DIST: float = float(os.getenv("COMPACT_MERGE_DIST", "0.35"))
+    COMPACT_BATCH: int = int(os.getenv("COMPACT_BATCH", "200"))
+    COMPACT_PAUSE: float = float(os.getenv("COMPACT_PAUSE", "0.2"))
+    COMPACT_LLM: bool = os.getenv("COMPACT_LLM", "0") == "1"
+    # yazarken bu mesafenin altındaki mevcut hafıza "aynı fact" sayılır (0: kapalı);
+    # COMPACT_MERGE_DIST gibi L2 cinsinden, metric cosine ise çevrilir
+    MEMORY_DEDUPE_MAX_DIST: float = float(os.getenv("MEMORY_DEDUPE_MAX_DIST", "0.25"))
+
+    # veritabanı havuzu (async engine)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_WARMUP: int = int(os.getenv("DB_POOL_WARMUP", "2"))
+    DB_MIGRATE_ON_STARTUP: bool = os.getenv("DB_MIGRATE_ON_STARTUP", "1") == "1"
+
+    # embedding cache: süreç içi LRU + opsiyonel Postgres katmanı
+    EMBED_CACHE_SIZE: int = int(os.getenv("EMBED_CACHE_SIZE", "5000"))
+    EMBED_CACHE_TTL: float = float(os.getenv("EMBED_CACHE_TTL", "86400"))
+    EMBED_CACHE_PG: bool = os.getenv("EMBED_CACHE_PG", "0") == "1"
+    # eşzamanlı embedding isteklerini birkaç ms biriktirip tek çağrıda gönder (0: kapalı)
+    EMBED_BATCH_WINDOW_MS: float = float(os.getenv("EMBED_BATCH_WINDOW_MS", "5"))
+    EMBED_BATCH_MAX: int = int(os.getenv("EMBED_BATCH_MAX", "64"))
+
+    # arka plan işleri (auto-memory): local | pg
+    JOBS_MODE: str = os.getenv("JOBS_MODE", "local")
+    JOBS_QUEUE_SIZE: int = int(os.getenv("JOBS_QUEUE_SIZE", "200"))
+    JOBS_CONCURRENCY: int = int(os.getenv("JOBS_CONCURRENCY", "4"))
+    JOBS_DROP_POLICY: str = os.getenv("JOBS_DROP_POLICY", "newest")  # newest | oldest
+    JOBS_DRAIN_TIMEOUT: float = float(os.getenv("JOBS_DRAIN_TIMEOUT", "10"))
+    JOBS_POLL_INTERVAL: float = float(os.getenv("JOBS_POLL_INTERVAL", "0.5"))
+    JOBS_MAX_ATTEMPTS: int = int(os.getenv("JOBS_MAX_ATTEMPTS", "3"))
+    JOBS_LEASE_SEC: float = float(os.getenv("JOBS_LEASE_SEC", "300"))  # pg: kira; dolunca iş başka worker'a geçer
+    JOBS_RETRY_BASE: float = float(os.getenv("JOBS_RETRY_BASE", "5"))  # pg: 5s, 10s, 20s ... üstel bekleme
+    JOBS_RETRY_MAX: float = float(os.getenv("JOBS_RETRY_MAX", "600"))
+
+    # /metrics (Prometheus); kapalıyken hook'lar no-op
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "0") == "1"
+
+    # upstream (OpenAI uyumlu) HTTP istemcisi
+    UPSTREAM_HTTP2: bool = os.getenv("UPSTREAM_HTTP2", "1") == "1"
+    UPSTREAM_MAX_CONNECTIONS: int = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+    UPSTREAM_MAX_KEEPALIVE: int = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "20"))
+    UPSTREAM_KEEPALIVE_EXPIRY: float = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+    UPSTREAM_CONNECT_TIMEOUT: float = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "5"))
+    UPSTREAM_TIMEOUT: float = float(os.getenv("UPSTREAM_TIMEOUT", "60"))
+    # upstream gateway: eşzamanlılık, öncelik, retry, rate-limit, circuit breaker
+    UPSTREAM_CONCURRENCY: int = int(os.getenv("UPSTREAM_CONCURRENCY", "32"))
+    UPSTREAM_CONCURRENCY_EMBED: int = int(os.getenv("UPSTREAM_CONCURRENCY_EMBED", "32"))
+    UPSTREAM_BG_SHARE: float = float(os.getenv("UPSTREAM_BG_SHARE", "0.25"))  # arka planın alabileceği slot payı
+    UPSTREAM_MAX_RETRIES: int = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+    UPSTREAM_RETRY_BASE_DELAY: float = float(os.getenv("UPSTREAM_RETRY_BASE_DELAY", "0.25"))
+    UPSTREAM_RETRY_MAX_DELAY: float = float(os.getenv("UPSTREAM_RETRY_MAX_DELAY", "8"))
+    UPSTREAM_RL_BG_RESERVE: int = int(os.getenv("UPSTREAM_RL_BG_RESERVE", "20"))
+    UPSTREAM_RL_MAX_WAIT: float = float(os.getenv("UPSTREAM_RL_MAX_WAIT", "10"))
+    UPSTREAM_BREAKER_FAILURES: int = int(os.getenv("UPSTREAM_BREAKER_FAILURES", "5"))
+    UPSTREAM_BREAKER_COOLDOWN: float = float(os.getenv("UPSTREAM_BREAKER_COOLDOWN", "15"))
 
 settings = Settings()
\ No newline at end of file
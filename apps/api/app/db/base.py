@@ -1,10 +1,73 @@
 from __future__ import annotations
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from app.config import settings
+from app.db import vector
 
-if not settings.DATABASE_URL:
-    raise RuntimeError("DATABASE_URL is not set")
+# Engine'ler ilk kullanımda kurulur: import DB'ye (hatta DATABASE_URL'e) dokunmaz,
+# worker boot'u ve testler Postgres beklemez.
+_engine: Engine | None = None
+_async_engine: AsyncEngine | None = None
+_session_factory: sessionmaker | None = None
+_async_session_factory: async_sessionmaker | None = None
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
\ No newline at end of file
+def _url() -> str:
+    if not settings.DATABASE_URL:
+        raise RuntimeError("DATABASE_URL is not set")
+    return settings.DATABASE_URL
+
+def get_engine() -> Engine:
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_engine(_url(), pool_pre_ping=True)
+        vector.install(_engine)
+        _session_factory = sessionmaker(bind=_engine, autocommit=False, autoflush=False)
+    return _engine
+
+def get_async_engine() -> AsyncEngine:
+    # chat yolu için async engine: event loop'u bloklamadan Postgres'e gider
+    global _async_engine, _async_session_factory
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            _url(),
+            pool_pre_ping=True,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+        vector.install(_async_engine)
+        _async_session_factory = async_sessionmaker(bind=_async_engine, expire_on_commit=False)
+    return _async_engine
+
+def SessionLocal() -> Session:
+    get_engine()
+    return _session_factory()
+
+def AsyncSessionLocal() -> AsyncSession:
+    get_async_engine()
+    return _async_session_factory()
+
+async def warmup(n: int) -> None:
+    """Havuza n bağlantıyı önceden aç (connect + vector adaptör kaydı ilk istekte ödenmesin)."""
+    if n <= 0:
+        return
+    eng = get_async_engine()
+
+    async def _one():
+        async with eng.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*[_one() for _ in range(n)])
+
+async def dispose() -> None:
+    global _engine, _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+    if _engine is not None:
+        _engine.dispose()
+        _engine = None
@@ -0,0 +1,171 @@
+"""
+Versiyonlu şema geçişleri. Lifespan'de (veya elle) çalışır:
+
+    python -m app.db.migrate
+
+Çok worker aynı anda boot etse de pg_advisory_lock sayesinde DDL'i yalnız biri
+koşar; diğerleri kilidi bekler ve uygulanmış sürümleri atlar. Her sürüm kendi
+transaction'ında uygulanıp `schema_migrations`'a yazılır.
+"""
+from __future__ import annotations
+import logging
+from typing import Callable, List, Tuple, Union
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from app.db.base import get_engine
+
+logger = logging.getLogger(__name__)
+
+_LOCK_KEY = 0x636F7274  # "cort"
+
+def _recall_hnsw(conn: Connection) -> None:
+    # ANN index: yalnızca hiç yoksa (taze DB) burada kurulur. Dolu tablolarda
+    # boot'u kilitlememek için geçiş `python -m app.memory.reindex` ile yapılır.
+    from app.memory.repo import HNSW_INDEX, LEGACY_INDEXES, hnsw_index_sql
+    has_ann = conn.execute(text("""
+        SELECT 1 FROM pg_indexes WHERE tablename = 'memories' AND indexname = ANY(:names)
+    """), {"names": [HNSW_INDEX, *LEGACY_INDEXES]}).first()
+    if not has_ann:
+        conn.execute(text(hnsw_index_sql()))
+
+def _lexical_index(conn: Connection) -> None:
+    # hybrid recall için full-text GIN: yalnızca RECALL_HYBRID açıksa ve tablo boşsa burada
+    # kurulur (kapalıyken her insert'te kimsenin sorgulamadığı bir index güncellenmesin).
+    # Dolu tablolarda `python -m app.memory.reindex` CONCURRENTLY kurar.
+    from app.memory.repo import lexical_index_sql
+    from app.config import settings
+    if settings.RECALL_HYBRID and not conn.execute(text("SELECT 1 FROM memories LIMIT 1")).first():
+        conn.execute(text(lexical_index_sql()))
+
+Step = Union[str, Callable[[Connection], None]]
+
+MIGRATIONS: List[Tuple[int, str, List[Step]]] = [
+    (1, "base", [
+        "CREATE EXTENSION IF NOT EXISTS vector",
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL DEFAULT ''
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS memories (
+            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+            user_id UUID NOT NULL,
+            kind TEXT NOT NULL,
+            content TEXT NOT NULL,
+            embedding vector(1536) NOT NULL,
+            meta JSONB NOT NULL DEFAULT '{}'::jsonb,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_mem_user ON memories(user_id)",
+    ]),
+    (2, "memories_content_hash", [
+        # exact dedupe anahtarı; eski satırlarda NULL kalır (unique'e takılmaz)
+        "ALTER TABLE memories ADD COLUMN IF NOT EXISTS content_hash TEXT",
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_mem_user_hash ON memories(user_id, content_hash)",
+    ]),
+    (3, "embedding_cache", [
+        """
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            embedding vector NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (model, text_hash)
+        )
+        """,
+    ]),
+    (4, "jobs", [
+        """
+        CREATE TABLE IF NOT EXISTS jobs (
+            id BIGSERIAL PRIMARY KEY,
+            name TEXT NOT NULL,
+            payload JSONB NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            attempts INT NOT NULL DEFAULT 0,
+            error TEXT,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(id) WHERE status = 'queued'",
+    ]),
+    (5, "recall_hnsw", [_recall_hnsw]),
+    (6, "conversations", [
+        """
+        CREATE TABLE IF NOT EXISTS conversations (
+            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+            user_id UUID NOT NULL,
+            summary TEXT NOT NULL DEFAULT '',
+            summarized_upto INT NOT NULL DEFAULT 0,
+            turn_count INT NOT NULL DEFAULT 0,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_conv_user ON conversations(user_id, updated_at DESC)",
+        """
+        CREATE TABLE IF NOT EXISTS conversation_turns (
+            conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+            seq INT NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            PRIMARY KEY (conversation_id, seq)
+        )
+        """,
+    ]),
+    (7, "memories_lexical", [_lexical_index]),
+    (8, "jobs_lease", [
+        "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS run_after TIMESTAMPTZ NOT NULL DEFAULT now()",
+        "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS locked_until TIMESTAMPTZ",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(locked_until) WHERE status = 'running'",
+    ]),
+]
+
+def run() -> int:
+    """Bekleyen sürümleri uygular; uygulanan sayısını döner."""
+    applied = 0
+    with get_engine().connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": _LOCK_KEY})
+        conn.commit()
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                )
+            """))
+            conn.commit()
+            done = {r[0] for r in conn.execute(text("SELECT version FROM schema_migrations"))}
+            for version, name, steps in MIGRATIONS:
+                if version in done:
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(text(step))
+                conn.execute(text("INSERT INTO schema_migrations (version, name) VALUES (:v, :n)"),
+                             {"v": version, "n": name})
+                conn.commit()
+                applied += 1
+                logger.info(f"[migrate] applied {version} {name}")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": _LOCK_KEY})
+            conn.commit()
+    if applied:
+        # uzantıdan önce açılmış (adaptörsüz) bağlantılar havuzda kalmasın
+        get_engine().dispose()
+    return applied
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"applied {run()} migration(s)")
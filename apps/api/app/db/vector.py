@@ -0,0 +1,70 @@
+from __future__ import annotations
+import numpy as np
+from sqlalchemy import event
+from psycopg.types import TypeInfo
+from pgvector.psycopg.vector import VectorLoader, VectorBinaryLoader, register_vector_info
+from app.config import settings
+
+# pgvector codec: embedding'ler metin literal ("[0.1,...]") yerine
+# float32 numpy dizisi olarak binary protokolle gider; dönen vector
+# kolonları da numpy dizisine çözülür (pgvector'ün kendi loader'ları
+# `pgvector.Vector` döner, aşağıda ndarray dönenlerle değiştirilir).
+
+class NdarrayLoader(VectorLoader):
+    def load(self, data):
+        return super().load(data).to_numpy()
+
+class NdarrayBinaryLoader(VectorBinaryLoader):
+    def load(self, data):
+        return super().load(data).to_numpy()
+
+def _adapt(conn, info: TypeInfo) -> None:
+    register_vector_info(conn, info)
+    conn.adapters.register_loader(info.oid, NdarrayLoader)
+    conn.adapters.register_loader(info.oid, NdarrayBinaryLoader)
+
+def to_param(emb) -> np.ndarray:
+    return np.asarray(emb, dtype=np.float32)
+
+def to_literal(emb) -> str:
+    # eski metin yolu; benchmark karşılaştırması için duruyor
+    return "[" + ",".join(f"{x:.8f}" for x in emb) + "]"
+
+def _session_sql() -> list[str]:
+    # ANN arama ayarları oturum başına bir kez; sorgu başına ekstra round-trip yok
+    out = [f"SET hnsw.ef_search = {int(settings.RECALL_EF_SEARCH)}"]
+    if settings.RECALL_ITERATIVE_SCAN:  # pgvector >= 0.8
+        out.append(f"SET hnsw.iterative_scan = {settings.RECALL_ITERATIVE_SCAN}")
+    return out
+
+# Uzantıyı burada oluşturmayız (migration 1, advisory lock altında yapar). Tip henüz
+# yoksa (boş DB, migration'ın kendi bağlantısı) adaptörler sessizce atlanır.
+async def _register_async(conn) -> None:
+    info = await TypeInfo.fetch(conn, "vector")
+    if info is not None:
+        for q in _session_sql():
+            await conn.execute(q)
+    await conn.commit()
+    if info is not None:
+        _adapt(conn, info)
+
+def _register(conn) -> None:
+    info = TypeInfo.fetch(conn, "vector")
+    if info is not None:
+        for q in _session_sql():
+            conn.execute(q)
+    conn.commit()
+    if info is not None:
+        _adapt(conn, info)
+
+def install(engine) -> None:
+    """Engine'in açtığı her bağlantıya vector adaptörlerini kaydet (sync/async)."""
+    sync_engine = getattr(engine, "sync_engine", None)
+    if sync_engine is not None:
+        @event.listens_for(sync_engine, "connect")
+        def _on_connect_async(dbapi_conn, _rec):
+            dbapi_conn.run_async(_register_async)
+    else:
+        @event.listens_for(engine, "connect")
+        def _on_connect(dbapi_conn, _rec):
+            _register(dbapi_conn)
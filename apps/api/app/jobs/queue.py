@@ -0,0 +1,199 @@
+from __future__ import annotations
+import asyncio, json, logging
+from typing import Any, Awaitable, Callable, Dict, List
+from sqlalchemy import text
+from app.config import settings
+from app.db.base import AsyncSessionLocal
+from app.utils import metrics
+from app.upstream import gateway
+
+logger = logging.getLogger(__name__)
+
+# Arka plan işleri (auto-memory çıkarımı vs.) için sınırlı kuyruk.
+#   JOBS_MODE=local -> süreç içi asyncio.Queue + sabit sayıda worker
+#   JOBS_MODE=pg    -> `jobs` tablosuna yazılır, app.jobs.worker ayrı süreçte tüketir
+# İşler isim + JSON payload'dur ki iki modda da aynı handler çalışsın.
+
+Handler = Callable[..., Awaitable[Any]]
+_handlers: Dict[str, Handler] = {}
+
+_queue: asyncio.Queue | None = None
+_workers: List[asyncio.Task] = []
+_accepting = False
+_stats: Dict[str, int] = {"submitted": 0, "dropped": 0, "done": 0, "failed": 0, "running": 0}
+
+def handler(name: str):
+    def deco(fn: Handler) -> Handler:
+        _handlers[name] = fn
+        return fn
+    return deco
+
+def stats() -> Dict[str, Any]:
+    depth = _queue.qsize() if _queue is not None else 0
+    return {**_stats, "depth": depth, "mode": settings.JOBS_MODE}
+
+async def _run(name: str, payload: Dict[str, Any]) -> None:
+    fn = _handlers.get(name)
+    if fn is None:
+        raise RuntimeError(f"unknown job: {name}")
+    _stats["running"] += 1
+    try:
+        # arka plan önceliği: upstream slotlarında kullanıcı isteklerinin arkasında
+        with gateway.background():
+            await fn(**payload)
+        _stats["done"] += 1
+        metrics.inc("jobs", name=name, outcome="done")
+    except Exception:
+        _stats["failed"] += 1
+        metrics.inc("jobs", name=name, outcome="failed")
+        raise
+    finally:
+        _stats["running"] -= 1
+
+async def _worker(q: asyncio.Queue) -> None:
+    while True:
+        name, payload = await q.get()
+        try:
+            await _run(name, payload)
+        except Exception as e:
+            logger.warning(f"[jobs] {name} failed: {e}")
+        finally:
+            q.task_done()
+
+def _enqueue_local(name: str, payload: Dict[str, Any]) -> bool:
+    if _queue is None or not _accepting:
+        _stats["dropped"] += 1
+        return False
+    try:
+        _queue.put_nowait((name, payload))
+        return True
+    except asyncio.QueueFull:
+        pass
+    if settings.JOBS_DROP_POLICY == "oldest":
+        # en eski işi at, yenisine yer aç (güncel mesajlar daha değerli)
+        try:
+            _queue.get_nowait()
+            _queue.task_done()
+            _queue.put_nowait((name, payload))
+        except (asyncio.QueueEmpty, asyncio.QueueFull):
+            pass
+    _stats["dropped"] += 1
+    metrics.inc("jobs", name=name, outcome="dropped")
+    logger.warning(f"[jobs] queue full, dropped ({settings.JOBS_DROP_POLICY}) depth={_queue.qsize()}")
+    return settings.JOBS_DROP_POLICY == "oldest"
+
+_PG_SUBMIT_SQL = text("INSERT INTO jobs (name, payload) VALUES (:n, CAST(:p AS jsonb))")
+
+async def submit(name: str, payload: Dict[str, Any]) -> bool:
+    """İşi kuyruğa koy; kuyruk doluysa politika gereği düşürülebilir (False)."""
+    _stats["submitted"] += 1
+    metrics.inc("jobs", name=name, outcome="submitted")
+    if settings.JOBS_MODE == "pg":
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(_PG_SUBMIT_SQL, {"n": name, "p": json.dumps(payload)})
+                await db.commit()
+            return True
+        except Exception as e:
+            _stats["dropped"] += 1
+            logger.warning(f"[jobs] pg submit skip: {e}")
+            return False
+    return _enqueue_local(name, payload)
+
+async def start() -> None:
+    global _queue, _accepting
+    if settings.JOBS_MODE != "local":
+        return
+    _queue = asyncio.Queue(maxsize=settings.JOBS_QUEUE_SIZE)
+    _workers[:] = [asyncio.create_task(_worker(_queue)) for _ in range(settings.JOBS_CONCURRENCY)]
+    _accepting = True
+    metrics.gauge_fn("jobs_queue_depth", "Background job queue depth", _queue.qsize)
+
+async def stop() -> None:
+    """Yeni iş alma, kuyruktakileri JOBS_DRAIN_TIMEOUT kadar bitirmeye çalış, sonra kapat."""
+    global _accepting
+    _accepting = False
+    if _queue is not None:
+        try:
+            await asyncio.wait_for(_queue.join(), timeout=settings.JOBS_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"[jobs] drain timeout, abandoning depth={_queue.qsize()}")
+    for t in _workers:
+        t.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+# --- pg modu tüketici tarafı (app.jobs.worker kullanır) ---
+# Kiralama: alınan iş `locked_until`'e kadar worker'ındır; worker çalışırken kirayı
+# uzatır (heartbeat). Worker ölürse kira dolar ve iş başka bir worker'a geçer.
+# Hata alan iş üstel beklemeyle (`run_after`) kuyruğa döner.
+_PG_REAP_SQL = text("""
+    UPDATE jobs SET status = 'failed', error = 'lease expired', locked_until = NULL, updated_at = now()
+    WHERE status = 'running' AND locked_until < now() AND attempts >= :max
+""")
+_PG_CLAIM_SQL = text("""
+    UPDATE jobs SET status = 'running', attempts = attempts + 1,
+                    locked_until = now() + :lease * interval '1 second', updated_at = now()
+    WHERE id IN (
+        SELECT id FROM jobs
+        WHERE (status = 'queued' AND run_after <= now())
+           OR (status = 'running' AND locked_until < now())
+        ORDER BY id
+        FOR UPDATE SKIP LOCKED
+        LIMIT :n
+    )
+    RETURNING id, name, payload, attempts
+""")
+_PG_HEARTBEAT_SQL = text("""
+    UPDATE jobs SET locked_until = now() + :lease * interval '1 second'
+    WHERE id = :id AND status = 'running'
+""")
+_PG_DONE_SQL = text("DELETE FROM jobs WHERE id = :id")
+_PG_FAIL_SQL = text("""
+    UPDATE jobs
+    SET status = CASE WHEN attempts >= :max THEN 'failed' ELSE 'queued' END,
+        run_after = now() + LEAST(:base * power(2, attempts - 1), :cap) * interval '1 second',
+        locked_until = NULL, error = :err, updated_at = now()
+    WHERE id = :id
+""")
+# kapanışta yarıda kesilen iş: deneme sayılmadan hemen kuyruğa döner
+_PG_RELEASE_SQL = text("""
+    UPDATE jobs SET status = 'queued', attempts = attempts - 1, locked_until = NULL, updated_at = now()
+    WHERE id = :id AND status = 'running'
+""")
+
+async def _exec(sql, params) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(sql, params)
+        await db.commit()
+
+async def claim(n: int) -> List[Any]:
+    async with AsyncSessionLocal() as db:
+        await db.execute(_PG_REAP_SQL, {"max": settings.JOBS_MAX_ATTEMPTS})
+        rows = (await db.execute(_PG_CLAIM_SQL, {"n": n, "lease": settings.JOBS_LEASE_SEC})).all()
+        await db.commit()
+    return rows
+
+async def _heartbeat(job_id: int) -> None:
+    while True:
+        await asyncio.sleep(settings.JOBS_LEASE_SEC / 3)
+        try:
+            await _exec(_PG_HEARTBEAT_SQL, {"id": job_id, "lease": settings.JOBS_LEASE_SEC})
+        except Exception as e:
+            logger.warning(f"[jobs] heartbeat #{job_id} skip: {e}")
+
+async def run_claimed(row) -> None:
+    hb = asyncio.create_task(_heartbeat(row.id))
+    try:
+        await _run(row.name, row.payload)
+        sql, params = _PG_DONE_SQL, {"id": row.id}
+    except asyncio.CancelledError:
+        await _exec(_PG_RELEASE_SQL, {"id": row.id})
+        raise
+    except Exception as e:
+        logger.warning(f"[jobs] {row.name}#{row.id} failed (attempt {row.attempts}): {e}")
+        sql, params = _PG_FAIL_SQL, {"id": row.id, "err": str(e)[:500], "max": settings.JOBS_MAX_ATTEMPTS,
+                                     "base": settings.JOBS_RETRY_BASE, "cap": settings.JOBS_RETRY_MAX}
+    finally:
+        hb.cancel()
+    await _exec(sql, params)
@@ -0,0 +1,53 @@
+"""
+pg modundaki `jobs` tablosunu tüketen ayrı süreç:
+
+    JOBS_MODE=pg python -m app.jobs.worker
+"""
+from __future__ import annotations
+import asyncio, logging, signal
+from app.config import settings
+from app.jobs import queue
+from app.db import base as db
+from app.db import migrate
+from app.upstream import client as upstream
+import app.chat.routes  # noqa: F401  (handler kayıtları)
+import app.memory.retention  # noqa: F401
+
+logger = logging.getLogger(__name__)
+
+async def main() -> None:
+    if settings.DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate.run)
+    # SIGTERM (deploy) / SIGINT: yeni iş alma, eldekileri JOBS_DRAIN_TIMEOUT kadar bitir;
+    # bitmeyenler kesilir ve kuyruğa geri bırakılır
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stopping.set)
+    pending: set[asyncio.Task] = set()
+    try:
+        while not stopping.is_set():
+            free = settings.JOBS_CONCURRENCY - len(pending)
+            rows = await queue.claim(free) if free > 0 else []
+            for row in rows:
+                t = asyncio.create_task(queue.run_claimed(row))
+                pending.add(t)
+                t.add_done_callback(pending.discard)
+            if not rows:
+                try:
+                    await asyncio.wait_for(stopping.wait(), settings.JOBS_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        logger.info(f"[worker] stopping, draining {len(pending)} job(s)")
+    finally:
+        if pending:
+            _, left = await asyncio.wait(pending, timeout=settings.JOBS_DRAIN_TIMEOUT)
+            for t in left:
+                t.cancel()
+            await asyncio.gather(*left, return_exceptions=True)
+        await upstream.close()
+        await db.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -1,12 +1,47 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from app.upstream import client as upstream
+from app.db import base as db
+from app.db import migrate
+from app.config import settings
+from app.jobs import queue as jobs
+from app.auth import passwords
+from app.utils import metrics
+from app.memory import extract, access, embed_cache, recall_cache
 from app.utils.logging import RequestIDMiddleware
 from app.auth.routes import router as auth_router
 from app.memory.routes import router as memory_router
 from app.chat.routes import router as chat_router
 import os
 
-app = FastAPI(title="Cortexa API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.DB_MIGRATE_ON_STARTUP:
+        await asyncio.to_thread(migrate.run)
+    await db.warmup(settings.DB_POOL_WARMUP)
+    await upstream.start()
+    await jobs.start()
+    pool = db.get_async_engine().pool
+    metrics.gauge_fn("db_pool_checked_out", "DB connections in use", pool.checkedout)
+    metrics.gauge_fn("db_pool_overflow", "DB overflow connections", pool.overflow)
+    metrics.gauge_fn("embed_cache_size", "Embeddings held in the in-process LRU", lambda: embed_cache.stats()["size"])
+    metrics.gauge_fn("embed_cache_hits", "Embedding cache hits (LRU + Postgres) since start",
+                     lambda: embed_cache.stats()["hits"] + embed_cache.stats()["pg_hits"])
+    metrics.gauge_fn("embed_cache_misses", "Embedding cache misses since start", lambda: embed_cache.stats()["misses"])
+    metrics.gauge_fn("recall_cache_size", "Cached recall results", lambda: recall_cache.stats()["size"])
+    try:
+        yield
+    finally:
+        # önce kuyruğu boşalt; işler upstream/DB'ye ihtiyaç duyuyor
+        await jobs.stop()
+        await access.flush()
+        await upstream.close()
+        await db.dispose()
+        passwords.shutdown()
+
+app = FastAPI(title="Cortexa API", lifespan=lifespan)
 
 # --- CORS ---
 ENV = os.getenv("ENV", "production")
@@ -33,12 +68,20 @@ app.add_middleware(
     allow_credentials=True,  # cookie/token cross-site için gerekli
     allow_methods=["*"],
     allow_headers=["*"],
-    # expose_headers=["X-Request-ID"],  # İstersen istemci görsün
+    expose_headers=["X-Request-ID", "Server-Timing"],
 )
 
 @app.get("/health")
 def health():
-    return {"ok": True}
+    return {"ok": True, "jobs": jobs.stats(), "extract": extract.stats(),
+            "embed_cache": embed_cache.stats(), "recall_cache": recall_cache.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    if not metrics.ENABLED:
+        raise HTTPException(404, "Metrics disabled")
+    body, ctype = metrics.render()
+    return Response(body, media_type=ctype)
 
 app.include_router(auth_router)
 app.include_router(memory_router)
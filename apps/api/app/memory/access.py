@@ -0,0 +1,63 @@
+from __future__ import annotations
+import asyncio, logging, time
+from typing import Dict, Iterable, Set
+from sqlalchemy import text
+from app.db.base import AsyncSessionLocal
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Recall erişim sayaçları (meta.hits / meta.last_hit): her okumada UPDATE atmak yerine
+# süreç içinde biriktirilir, MEMORY_ACCESS_FLUSH_SEC ya da _MAX_PENDING'de tek sorguyla yazılır.
+# Sayaçlar retention/decay kararlarında kullanılır; kaybolan birkaç tık önemsiz.
+
+_MAX_PENDING = 5000
+_pending: Dict[str, int] = {}
+_first = 0.0
+_tasks: Set[asyncio.Task] = set()
+
+_FLUSH_SQL = text("""
+    UPDATE memories m SET meta = m.meta || jsonb_build_object(
+        'hits', LEAST(COALESCE((m.meta->>'hits')::bigint, 0) + a.n, 2147483647),
+        'last_hit', now()
+    )
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:ns AS int[])) AS a(id, n)
+    WHERE m.id = a.id
+""")
+
+def record(mems: Iterable) -> None:
+    global _first
+    if settings.MEMORY_ACCESS_FLUSH_SEC <= 0:
+        return
+    for m in mems:
+        if m.id:
+            _pending[m.id] = _pending.get(m.id, 0) + 1
+    if not _pending:
+        return
+    now = time.monotonic()
+    if not _first:
+        _first = now
+    if len(_pending) >= _MAX_PENDING or now - _first >= settings.MEMORY_ACCESS_FLUSH_SEC:
+        _schedule()
+
+def _schedule() -> None:
+    global _pending, _first
+    batch, _pending, _first = _pending, {}, 0.0
+    t = asyncio.create_task(_write(batch))
+    _tasks.add(t)
+    t.add_done_callback(_tasks.discard)
+
+async def _write(batch: Dict[str, int]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_FLUSH_SQL, {"ids": list(batch), "ns": list(batch.values())})
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"[access] flush of {len(batch)} skipped: {e}")
+
+async def flush() -> None:
+    """Kapanışta bekleyen sayaçları yaz."""
+    if _pending:
+        _schedule()
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
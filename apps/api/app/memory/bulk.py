@@ -0,0 +1,159 @@
+from __future__ import annotations
+import asyncio, json, logging
+from typing import Any, AsyncIterator, Dict, List
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import text
+from app.db.base import AsyncSessionLocal
+from app.memory.embeddings import embed_bulk
+from app.memory.repo import clean_meta, content_hash, _on_write
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Toplu NDJSON import/export.
+#   import: satırlar IMPORT_BATCH'lik parçalara bölünür; en fazla IMPORT_CONCURRENCY parça
+#           aynı anda embed+yükleme yapar (istek gövdesi de bu hızda okunur -> sabit bellek).
+#           Her parça temp tabloya COPY ile girer, tek INSERT..SELECT ile memories'e aktarılır.
+#   export: server-side cursor, EXPORT_FETCH'lik partition'lar halinde akar.
+
+DIM = 1536
+_MAX_ERRORS = 20
+
+_STAGE_SQL = """
+    CREATE TEMP TABLE IF NOT EXISTS mem_import (
+        kind TEXT, content TEXT, embedding vector(1536), meta JSONB, content_hash TEXT
+    ) ON COMMIT DELETE ROWS
+"""
+_COPY_SQL = "COPY mem_import (kind, content, embedding, meta, content_hash) FROM STDIN"
+# tam eşleşen içerik (aynı hash) atlanır; yakın-kopya birleştirmesi toplu yolda yapılmaz
+_MERGE_SQL = """
+    INSERT INTO memories (user_id, kind, content, embedding, meta, content_hash)
+    SELECT %(uid)s::uuid, kind, content, embedding, meta, content_hash FROM mem_import
+    ON CONFLICT (user_id, content_hash) DO NOTHING
+"""
+
+def parse_line(raw: bytes) -> Dict[str, Any]:
+    obj = json.loads(raw)
+    if not isinstance(obj, dict):
+        raise ValueError("expected object")
+    content = str(obj.get("content") or "").strip()
+    if not content:
+        raise ValueError("content missing")
+    meta = obj.get("meta") or {}
+    if not isinstance(meta, dict):
+        raise ValueError("meta must be an object")
+    emb = obj.get("embedding")
+    if emb is not None:
+        try:
+            emb = np.asarray(emb, dtype=np.float32)
+        except (TypeError, ValueError):
+            raise ValueError("embedding must be a list of numbers")
+        if emb.shape != (DIM,):
+            raise ValueError(f"embedding must have {DIM} dims")
+        # json.loads NaN/Infinity kabul eder; pgvector ise tüm COPY parçasını reddeder
+        if not np.isfinite(emb).all():
+            raise ValueError("embedding must be finite")
+    return {"kind": str(obj.get("kind") or "note"), "content": content,
+            "meta": clean_meta({"source": "import", **meta}), "emb": emb}
+
+async def _lines(body: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    buf = b""
+    async for chunk in body:
+        buf += chunk
+        *lines, buf = buf.split(b"\n")
+        for line in lines:
+            yield line
+        if len(buf) > settings.IMPORT_MAX_LINE:
+            raise HTTPException(413, f"line exceeds {settings.IMPORT_MAX_LINE} bytes")
+    if buf:
+        yield buf
+
+async def _load(user_id: str, items: List[Dict[str, Any]]) -> int:
+    missing = [it for it in items if it["emb"] is None]
+    if missing:
+        for it, emb in zip(missing, await embed_bulk([it["content"] for it in missing])):
+            it["emb"] = np.asarray(emb, dtype=np.float32)
+    async with AsyncSessionLocal() as db:
+        conn = await db.connection()
+        raw = (await conn.get_raw_connection()).driver_connection
+        async with raw.cursor() as cur:
+            await cur.execute(_STAGE_SQL)
+            async with cur.copy(_COPY_SQL) as cp:
+                for it in items:
+                    await cp.write_row((it["kind"], it["content"], it["emb"],
+                                        json.dumps(it["meta"]), content_hash(it["content"])))
+            await cur.execute(_MERGE_SQL, {"uid": user_id})
+            inserted = cur.rowcount
+        await db.commit()
+    return inserted
+
+async def import_ndjson(user_id: str, body: AsyncIterator[bytes]) -> Dict[str, Any]:
+    stats: Dict[str, Any] = {"received": 0, "inserted": 0, "skipped": 0, "failed": 0, "errors": []}
+    sem = asyncio.Semaphore(max(1, settings.IMPORT_CONCURRENCY))
+    tasks: set[asyncio.Task] = set()
+
+    async def run(batch: List[Dict[str, Any]]) -> None:
+        try:
+            n = await _load(user_id, batch)
+            stats["inserted"] += n
+            stats["skipped"] += len(batch) - n
+        except Exception as e:
+            logger.warning(f"[import] uid={user_id} batch of {len(batch)} failed: {e}")
+            stats["failed"] += len(batch)
+            if len(stats["errors"]) < _MAX_ERRORS:
+                stats["errors"].append({"batch_rows": len(batch), "error": str(e)})
+        finally:
+            sem.release()
+
+    async def submit(batch: List[Dict[str, Any]]) -> None:
+        # slot yoksa burada bekler -> gövde okuma da durur (backpressure)
+        await sem.acquire()
+        t = asyncio.create_task(run(batch))
+        tasks.add(t)
+        t.add_done_callback(tasks.discard)
+
+    batch: List[Dict[str, Any]] = []
+    lineno = 0
+    try:
+        async for line in _lines(body):
+            lineno += 1
+            if not line.strip():
+                continue
+            stats["received"] += 1
+            try:
+                batch.append(parse_line(line))
+            except (ValueError, TypeError) as e:  # JSONDecodeError da ValueError
+                stats["failed"] += 1
+                if len(stats["errors"]) < _MAX_ERRORS:
+                    stats["errors"].append({"line": lineno, "error": str(e)})
+                continue
+            if len(batch) >= settings.IMPORT_BATCH:
+                await submit(batch)
+                batch = []
+        if batch:
+            await submit(batch)
+    finally:
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if stats["inserted"]:
+            _on_write(user_id)
+    return stats
+
+def _export_sql(with_embeddings: bool):
+    cols = "kind, content, meta, created_at" + (", embedding" if with_embeddings else "")
+    return text(f"SELECT {cols} FROM memories WHERE user_id = :uid").execution_options(
+        yield_per=settings.EXPORT_FETCH)
+
+def _row_json(r, with_embeddings: bool) -> str:
+    out = {"kind": r.kind, "content": r.content, "meta": r.meta,
+           "created_at": r.created_at.isoformat() if r.created_at else None}
+    if with_embeddings:
+        out["embedding"] = r.embedding.tolist()
+    return json.dumps(out, ensure_ascii=False)
+
+async def export_ndjson(user_id: str, with_embeddings: bool = False) -> AsyncIterator[bytes]:
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_export_sql(with_embeddings), {"uid": user_id})
+        async for part in result.partitions():
+            yield ("\n".join(_row_json(r, with_embeddings) for r in part) + "\n").encode("utf-8")
@@ -0,0 +1,53 @@
+"""
+Kompakt recall index'i (halfvec, opsiyonel Matryoshka kırpma):
+
+    python -m app.memory.compact                 # RECALL_COMPACT_DIMS ile index'i CONCURRENTLY kur
+    python -m app.memory.compact --dims 512      # ilk 512 boyut (text-embedding-3)
+    python -m app.memory.compact --drop-full     # kurulduktan sonra tam boyutlu HNSW'yi düşür
+
+Ayrı kolon yok: index `embedding` üzerindeki ifadeden kurulur, mevcut satırlar
+index build sırasında doldurulur (backfill), yeni satırlar otomatik girer. Tam
+vektör heap'te kalır ve rescoring için kullanılır. Sonrasında RECALL_COMPACT=1 ile
+(aynı RECALL_COMPACT_DIMS değeriyle) sorgu bu index'e geçer. Karşılaştırma:
+`python -m bench.compact_recall`.
+"""
+from __future__ import annotations
+import argparse, logging
+from sqlalchemy import text
+from app.db.base import get_engine
+from app.config import settings
+from app.memory.repo import COMPACT_INDEX, HNSW_INDEX, compact_index_sql
+
+logger = logging.getLogger(__name__)
+
+def main(dims: int, drop_full: bool = False, maintenance_work_mem: str = "1GB") -> None:
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # farklı boyutla kurulmuş eski compact index varsa yeniden kur
+        row = conn.execute(text("""
+            SELECT indexdef FROM pg_indexes WHERE tablename = 'memories' AND indexname = :n
+        """), {"n": COMPACT_INDEX}).first()
+        if row and f"halfvec({dims})" not in row.indexdef:
+            logger.info(f"[compact] {COMPACT_INDEX} dims mismatch, rebuilding")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {COMPACT_INDEX}"))
+        conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+        logger.info(f"[compact] building {COMPACT_INDEX} (halfvec({dims}))")
+        conn.execute(text(compact_index_sql(dims, concurrently=True)))
+        if drop_full:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {HNSW_INDEX}"))
+        conn.execute(text("ANALYZE memories"))
+        sizes = conn.execute(text("""
+            SELECT indexname, pg_size_pretty(pg_relation_size(indexname::regclass)) AS size
+            FROM pg_indexes WHERE tablename = 'memories' AND indexname = ANY(:names)
+        """), {"names": [COMPACT_INDEX, HNSW_INDEX]}).all()
+    for r in sizes:
+        logger.info(f"[compact] {r.indexname}: {r.size}")
+    logger.info("[compact] done")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--dims", type=int, default=settings.RECALL_COMPACT_DIMS)
+    ap.add_argument("--drop-full", action="store_true")
+    ap.add_argument("--maintenance-work-mem", default="1GB")
+    args = ap.parse_args()
+    main(args.dims, args.drop_full, args.maintenance_work_mem)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import hashlib, logging
+from typing import Awaitable, Callable, Dict, List, Tuple
+import numpy as np
+from sqlalchemy import text
+from app.config import settings
+from app.db.base import AsyncSessionLocal
+from app.utils.lru import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# (model, normalize edilmiş metnin sha256'sı) -> embedding
+Key = Tuple[str, str]
+
+def normalize(t: str) -> str:
+    return " ".join((t or "").strip().split())
+
+def _key(model: str, norm: str) -> Key:
+    return model, hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+_lru: TTLCache[np.ndarray] = TTLCache(settings.EMBED_CACHE_SIZE, settings.EMBED_CACHE_TTL)
+_stats: Dict[str, int] = {"hits": 0, "pg_hits": 0, "misses": 0}
+
+def stats() -> Dict[str, int]:
+    return {**_stats, "size": len(_lru)}
+
+def _freeze(emb) -> np.ndarray:
+    arr = np.asarray(emb, dtype=np.float32)
+    arr.flags.writeable = False  # paylaşılan nesne; çağıran değiştiremesin
+    return arr
+
+# --- kalıcı katman (Postgres, EMBED_CACHE_PG=1 ise) ---
+_PG_GET_SQL = text("""
+    SELECT text_hash, embedding FROM embedding_cache
+    WHERE model = :m AND text_hash = ANY(:h)
+""")
+_PG_PUT_SQL = text("""
+    INSERT INTO embedding_cache (model, text_hash, embedding)
+    VALUES (:m, :h, :e)
+    ON CONFLICT (model, text_hash) DO NOTHING
+""")
+
+async def _pg_get(model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+    try:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(_PG_GET_SQL, {"m": model, "h": hashes})).all()
+        return {r.text_hash: _freeze(r.embedding) for r in rows}
+    except Exception as e:
+        logger.warning(f"[embed-cache] pg get skip: {e}")
+        return {}
+
+async def _pg_put(model: str, items: List[Tuple[str, np.ndarray]]) -> None:
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(_PG_PUT_SQL, [{"m": model, "h": h, "e": e} for h, e in items])
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"[embed-cache] pg put skip: {e}")
+
+async def get_or_embed(
+    texts: List[str],
+    model: str,
+    fetch: Callable[[List[str]], Awaitable[List[List[float]]]],
+) -> List[np.ndarray]:
+    """
+    Önce LRU, sonra (açıksa) Postgres katmanı; kalan metinler tek `fetch`
+    çağrısıyla upstream'den alınır. Aynı metin listede tekrar ederse bir kez gider.
+    """
+    norms = [normalize(t) for t in texts]
+    keys = [_key(model, n) for n in norms]
+    out: Dict[Key, np.ndarray] = {}
+
+    missing: Dict[Key, str] = {}
+    for k, n in zip(keys, norms):
+        if k in out or k in missing:
+            continue
+        emb = _lru.get(k)
+        if emb is not None:
+            _stats["hits"] += 1
+            out[k] = emb
+        else:
+            missing[k] = n
+
+    if missing and settings.EMBED_CACHE_PG:
+        found = await _pg_get(model, [h for _, h in missing])
+        for k in list(missing):
+            emb = found.get(k[1])
+            if emb is not None:
+                _stats["pg_hits"] += 1
+                _lru.put(k, emb)
+                out[k] = emb
+                del missing[k]
+
+    if missing:
+        _stats["misses"] += len(missing)
+        fetched = await fetch(list(missing.values()))
+        new = []
+        for k, emb in zip(missing, fetched):
+            arr = _freeze(emb)
+            _lru.put(k, arr)
+            out[k] = arr
+            new.append((k[1], arr))
+        if settings.EMBED_CACHE_PG:
+            await _pg_put(model, new)
+
+    return [out[k] for k in keys]
@@ -1,14 +1,96 @@
-from typing import List
-import httpx
+import asyncio, contextvars
+from typing import Awaitable, Callable, Dict, List, Set
+import numpy as np
+from app.upstream import client as upstream
+from app.upstream import gateway
+from app.memory import embed_cache
+from app.utils import metrics
 from app.config import settings
 
-MODEL = "text-embedding-3-small"
+async def _fetch(texts: List[str]) -> List[List[float]]:
+    payload = {"model": settings.OPENAI_EMBED_MODEL, "input": texts}
+    with metrics.timer("embed_seconds"):
+        r = await upstream.post("/embeddings", json=payload, timeout=30)
+    data = sorted(r.json()["data"], key=lambda it: it.get("index", 0))
+    return [item["embedding"] for item in data]
 
-async def embed_texts(texts: List[str]) -> List[List[float]]:
-    headers = {"Authorization": f"Bearer {settings.OPENAI_API_KEY}"}
-    payload = {"model": MODEL, "input": texts}
-    async with httpx.AsyncClient(timeout=30) as client:
-        r = await client.post("https://api.openai.com/v1/embeddings", headers=headers, json=payload)
-        r.raise_for_status()
-        data = r.json()
-        return [item["embedding"] for item in data["data"]]
\ No newline at end of file
+class _Batcher:
+    """
+    Eşzamanlı coroutine'lerden gelen embedding isteklerini `window` saniye (ya da
+    `max_size` farklı metin) biriktirip tek /embeddings çağrısıyla gönderir,
+    sonuçları çağıranlara dağıtır. Aynı metin batch içinde bir kez gider.
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[List[List[float]]]], window: float, max_size: int):
+        self._fetch = fetch
+        self.window = window
+        self.max_size = max_size
+        self._pending: Dict[str, List[asyncio.Future]] = {}
+        self._bg_only = True
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        futs = []
+        for t in texts:
+            f = loop.create_future()
+            self._pending.setdefault(t, []).append(f)
+            futs.append(f)
+        # batch'te tek bir kullanıcı isteği bile varsa upstream'e yüksek öncelikle gider
+        self._bg_only = self._bg_only and gateway.is_background()
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            # boş context: pencereyi açan çağıranın contextvar'ları (öncelik, request id)
+            # batch'e sızmasın; öncelik aşağıda `bg`'den açıkça kurulur
+            self._timer = loop.call_later(self.window, self._flush, context=contextvars.Context())
+        return list(await asyncio.gather(*futs))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, {}
+        bg, self._bg_only = self._bg_only, True
+        if batch:
+            t = asyncio.create_task(self._run(batch, bg), context=contextvars.Context())
+            self._tasks.add(t)
+            t.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: Dict[str, List[asyncio.Future]], bg: bool) -> None:
+        texts = list(batch)
+        chunks = [texts[i:i + self.max_size] for i in range(0, len(texts), self.max_size)]
+        metrics.observe("embed_batch_size", len(texts))
+        try:
+            if bg:
+                with gateway.background():
+                    parts = await asyncio.gather(*[self._fetch(c) for c in chunks])
+            else:
+                parts = await asyncio.gather(*[self._fetch(c) for c in chunks])
+        except Exception as e:
+            for fs in batch.values():
+                for f in fs:
+                    if not f.done():
+                        f.set_exception(e)
+            return
+        embs = [e for part in parts for e in part]
+        for t, emb in zip(texts, embs):
+            for f in batch[t]:
+                if not f.done():
+                    f.set_result(emb)
+
+_batcher = _Batcher(_fetch, settings.EMBED_BATCH_WINDOW_MS / 1000, settings.EMBED_BATCH_MAX)
+
+async def embed_texts(texts: List[str]) -> List[np.ndarray]:
+    # tekrar eden metinler cache'ten döner; kalanlar eşzamanlı isteklerle tek batch'te gider
+    fetch = _batcher.embed if settings.EMBED_BATCH_WINDOW_MS > 0 else _fetch
+    return await embed_cache.get_or_embed(texts, settings.OPENAI_EMBED_MODEL, fetch)
+
+async def embed_bulk(texts: List[str]) -> List[List[float]]:
+    # toplu import: cache'i (ve micro-batcher'ı) atlar ki sıcak LRU milyonlarca tek
+    # seferlik metinle çalkalanmasın; EMBED_BATCH_MAX'lık parçalar arka plan önceliğiyle gider
+    n = settings.EMBED_BATCH_MAX
+    with gateway.background():
+        parts = [await _fetch(texts[i:i + n]) for i in range(0, len(texts), n)]
+    return [e for part in parts for e in part]
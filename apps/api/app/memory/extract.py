@@ -1,15 +1,14 @@
 # app/memory/extract.py
 from __future__ import annotations
-import os
-import httpx
 import json
+import logging
 import re
 from typing import List, Dict
+from app.upstream import client as upstream
+from app.utils import metrics
+from app.config import settings
 
-# --- OpenAI ayarları (seninkiyle aynı) ---
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_API_BASE = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
-OPENAI_EXTRACT_MODEL = os.getenv("OPENAI_EXTRACT_MODEL", "gpt-4o-mini")
+logger = logging.getLogger(__name__)
 
 SYSTEM_PROMPT = (
     "You extract long-lived user facts for a personal memory store.\n"
@@ -22,6 +21,8 @@ SYSTEM_PROMPT = (
     "- Prefer Turkish output for content if the user wrote Turkish.\n"
 )
 
+_KINDS = {"profile", "preference", "fact", "task", "company", "contact", "note"}
+
 # --- Basit yerel çıkarım (fallback) ---
 _NAME_RE = re.compile(r"\b(?:benim\s+ad[ıi]m|ad[ıi]m)\s+(?P<name>[A-Za-zçğıöşüÇĞİÖŞÜ]+)\b", re.IGNORECASE)
 _AGE_RE  = re.compile(r"\b(?P<age>\d{1,2})\s*yaş(?:ındayım|ınday[ıi]m|ında|ım|im)?\b", re.IGNORECASE)
@@ -62,56 +63,117 @@ def _regex_fallback(message: str) -> List[Dict]:
     return out[:8]
 
 
-async def extract_facts(message: str) -> List[Dict]:
+# --- Ucuz yerel kapı: hafızaya değer sinyal yoksa LLM'e hiç gitme ---
+_SMALL_TALK = {
+    "ok", "okay", "tamam", "tmm", "peki", "evet", "hayır", "yes", "no", "thanks", "thank you", "thx",
+    "teşekkürler", "teşekkür ederim", "sağol", "sağ ol", "eyvallah", "merhaba", "selam", "hi",
+    "hello", "hey", "naber", "nasılsın", "günaydın", "iyi geceler", "görüşürüz", "bye",
+}
+# birinci tekil şahıs / kalıcı bilgi ipuçları (Türkçe kökler ekleri kapsasın diye sağdan açık)
+_SIGNAL_RE = re.compile(
+    r"\b(?:ben\b|benim|bana\b|beni\b|ad[ıi]m|yaş|doğdum|doğum|yaşıyorum|oturuyorum|çalışıyorum|"
+    r"okuyorum|öğrenci|mezun|meslek|geliştirici|sev(?:iyorum|erim|mem|miyorum)|nefret|tercih|"
+    r"hatırla|unutma|eşim|annem|babam|kızım|oğlum|kardeşim|şirket|işim|işyerim|alerji|taşındım|"
+    r"i am\b|i'm\b|i've\b|my\b|remember|"
+    r"i (?:have|had|live|lived|work|worked|study|studied|moved|use|used|like|love|prefer|hate|"
+    r"own|speak|drive|play|grew up|was born|got married|just started|started|quit)\b)"
+    # Türkçe ek-fiil 1. tekil, ünlüden sonra -yIm (hastayım, öğrenciyim)
+    r"|\w+[aeıioöuü]y[ıiuü]m\b",
+    re.IGNORECASE,
+)
+# ünsüzden sonra -Im/-Um (mühendisim, doktorum) isimlerle karışır (çözüm, resim, forum,
+# minimum); yalnız yüklem yerinde, yani cümle/yan cümle sonunda ve yaygın isim değilse sayılır
+_COPULA_RE = re.compile(r"(\w{2,}[^\W\daeıioöuü][ıiuü]m)\s*(?:[.!,;]|$)", re.IGNORECASE)
+_NOT_COPULA = frozenset("""
+    album forum minimum maximum optimum serum quantum momentum spectrum curriculum
+    interim denim muslim pilgrim victim
+    çözüm bölüm durum resim tanım eğitim öğretim üretim iletişim yatırım kurum
+    hüküm ölçüm kilim bilim teslim
+""".split())
+
+_stats: Dict[str, int] = {"checked": 0, "skipped": 0, "llm": 0, "fallback": 0}
+
+def stats() -> Dict[str, float]:
+    checked = _stats["checked"] or 1
+    return {**_stats, "skip_rate": round(_stats["skipped"] / checked, 3)}
+
+def has_signal(message: str) -> bool:
+    t = _norm(message)
+    if not t:
+        return False
+    if t.lower().strip(" .!?,") in _SMALL_TALK:
+        return False
+    # _JOB_RE kapıda kullanılmaz: çıplak "ai"/"ml" soruları da ("what is ai") geçirir
+    if _NAME_RE.search(t) or _AGE_RE.search(t):
+        return True
+    # uzunluk eşiği yok: kısa mesaj da sinyal taşıyabilir ("hastayım")
+    if _SIGNAL_RE.search(t):
+        return True
+    return any(w.lower() not in _NOT_COPULA for w in _COPULA_RE.findall(t))
+
+def _parse(content: str) -> List[Dict]:
+    # ```json ... ``` sarmalını tolere et
+    content = content.strip()
+    if content.startswith("```"):
+        content = content.strip("`")
+        content = content[content.find("["):] if "[" in content else content
+    data = json.loads(content)
+    out: List[Dict] = []
+    if not isinstance(data, list):
+        return out
+    for it in data:
+        if not isinstance(it, dict):
+            continue
+        kind = (it.get("kind") or "note").strip().lower()
+        text = (it.get("content") or "").strip()
+        if not text:
+            continue
+        if kind not in _KINDS:
+            kind = "note"
+        score = max(0.0, min(1.0, float(it.get("score", 0.6))))
+        out.append({"kind": kind, "content": text, "score": score})
+    return out[:8]
+
+def gate(message: str) -> bool:
+    """Kapıdan geçerse True; skip oranı buradan sayılır."""
+    _stats["checked"] += 1
+    if settings.EXTRACT_GATE and not has_signal(message):
+        _stats["skipped"] += 1
+        metrics.inc("extract", outcome="skipped")
+        return False
+    return True
+
+async def extract_facts(message: str, gated: bool = False) -> List[Dict]:
     """
-    Kullanıcı mesajından kalıcı olabilecek bilgiler çıkarır.
+    Kullanıcı mesajından kalıcı olabilecek bilgiler çıkarır (tek çıkarım hattı).
+    0) Yerel kapı: sinyal yoksa [] (LLM çağrısı yok); `gated=True` ise çağıran zaten baktı
     1) OpenAI'den yapılandırılmış JSON dene
     2) Boş/başarısız ise regex fallback kullan
     DÖNÜŞ: [{kind, content, score}, ...]
     """
-    # --- A) OpenAI yolu ---
-    if OPENAI_API_KEY:
+    if not gated and not gate(message):
+        return []
+
+    if settings.OPENAI_API_KEY:
+        _stats["llm"] += 1
+        metrics.inc("extract", outcome="llm")
         payload = {
-            "model": OPENAI_EXTRACT_MODEL,
+            "model": settings.OPENAI_EXTRACT_MODEL,
             "messages": [
                 {"role": "system", "content": SYSTEM_PROMPT},
                 {"role": "user", "content": f"Message:\n{message}\n\nJSON array only."}
             ],
             "temperature": 0.0,
         }
-
         try:
-            async with httpx.AsyncClient(timeout=45) as client:
-                r = await client.post(
-                    f"{OPENAI_API_BASE}/chat/completions",
-                    headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
-                    json=payload,
-                )
-                r.raise_for_status()
-                content = r.json()["choices"][0]["message"]["content"]
-            try:
-                data = json.loads(content)
-                if isinstance(data, list) and data:
-                    out: List[Dict] = []
-                    for it in data:
-                        kind = (it.get("kind") or "note").strip().lower()
-                        text = (it.get("content") or "").strip()
-                        score = float(it.get("score", 0.6))
-                        if not text:
-                            continue
-                        if kind not in {"profile", "preference", "fact", "task", "company", "contact", "note"}:
-                            kind = "note"
-                        score = max(0.0, min(1.0, score))
-                        out.append({"kind": kind, "content": text, "score": score})
-                    # OpenAI’den bir şey çıktıysa direkt dön
-                    if out:
-                        return out[:8]
-            except Exception:
-                pass  # JSON bozuksa fallback'e düşeceğiz
-
-        except httpx.HTTPError:
-            # network/rate limit vs. => fallback'e düş
-            pass
-
-    # --- B) Regex fallback ---
-    return _regex_fallback(message)
\ No newline at end of file
+            r = await upstream.post("/chat/completions", json=payload, timeout=45)
+            out = _parse(r.json()["choices"][0]["message"]["content"])
+            if out:
+                return out
+        except Exception as e:
+            # network/rate limit/bozuk JSON => fallback'e düş
+            logger.warning(f"[extract] fallback: {e}")
+
+    _stats["fallback"] += 1
+    metrics.inc("extract", outcome="fallback")
+    return _regex_fallback(message)
@@ -0,0 +1,45 @@
+from __future__ import annotations
+import hashlib, itertools
+from typing import Any, Dict, List
+import numpy as np
+from app.config import settings
+from app.utils.lru import TTLCache
+
+# Kullanıcı başına recall sonucu cache'i. Anahtar: (uid, sürüm, kuantize sorgu
+# embedding'i, k, max_dist). Repo'daki her yazma kullanıcının sürümünü artırır,
+# eski sürümlü girdiler bir daha eşleşmez ve LRU'dan kendiliğinden düşer.
+# Sürüm süreç içidir: başka süreçten (pg job worker vb.) gelen yazmalar TTL ile yakalanır.
+
+Rows = List[Any]  # repo.Memory listesi
+
+_cache: TTLCache[Rows] = TTLCache(settings.RECALL_CACHE_SIZE, settings.RECALL_CACHE_TTL)
+_versions: TTLCache[int] = TTLCache(100_000)
+_seq = itertools.count(1)
+_stats: Dict[str, int] = {"hits": 0, "misses": 0}
+
+def stats() -> Dict[str, int]:
+    return {**_stats, "size": len(_cache)}
+
+def enabled() -> bool:
+    return settings.RECALL_CACHE_SIZE > 0
+
+def bump(user_id: str) -> None:
+    # global sayaç: LRU'dan düşen bir kullanıcı eski sürüm numarasına geri dönemez
+    _versions.put(user_id, next(_seq))
+
+def _qhash(query_emb) -> str:
+    # yakın sorgular aynı kovaya düşsün diye 1/RECALL_CACHE_QUANT çözünürlükte yuvarla
+    q = np.rint(np.asarray(query_emb, dtype=np.float32) * settings.RECALL_CACHE_QUANT).astype(np.int16)
+    return hashlib.blake2b(q.tobytes(), digest_size=16).hexdigest()
+
+def key(user_id: str, query_emb, k: int, max_dist: float, *extra) -> tuple:
+    # extra: sonucu etkileyen diğer filtreler (kind listesi, lexical sorgu)
+    return (user_id, _versions.get(user_id) or 0, _qhash(query_emb), k, max_dist, *extra)
+
+def get(key: tuple) -> Rows | None:
+    rows = _cache.get(key)
+    _stats["hits" if rows is not None else "misses"] += 1
+    return rows
+
+def put(key: tuple, rows: Rows) -> None:
+    _cache.put(key, rows)
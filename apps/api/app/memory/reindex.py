@@ -0,0 +1,47 @@
+"""
+Recall index geçişi (ivfflat -> HNSW, metric RECALL_METRIC ile tutarlı):
+
+    python -m app.memory.reindex            # HNSW'yi CONCURRENTLY kur, eski indexleri düşür
+    python -m app.memory.reindex --keep-old # eskileri bırak (geri dönüş için)
+
+RECALL_HYBRID=1 ise hybrid recall'un full-text GIN indexi de CONCURRENTLY kurulur.
+
+CONCURRENTLY yazmaları kilitlemez; uzun sürebilir, boot'tan ayrı koşturulur.
+"""
+from __future__ import annotations
+import argparse, logging
+from sqlalchemy import text
+from app.db.base import get_engine
+from app.config import settings
+from app.memory.repo import HNSW_INDEX, LEGACY_INDEXES, INDEX_OPS, LEXICAL_INDEX, hnsw_index_sql, lexical_index_sql
+
+logger = logging.getLogger(__name__)
+
+def main(keep_old: bool = False, maintenance_work_mem: str = "1GB") -> None:
+    with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # opclass farklı eski bir HNSW varsa (metric değişmiş) yeniden kur
+        row = conn.execute(text("""
+            SELECT indexdef FROM pg_indexes WHERE tablename = 'memories' AND indexname = :n
+        """), {"n": HNSW_INDEX}).first()
+        if row and INDEX_OPS not in row.indexdef:
+            logger.info(f"[reindex] {HNSW_INDEX} metric mismatch, rebuilding")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {HNSW_INDEX}"))
+        conn.execute(text(f"SET maintenance_work_mem = '{maintenance_work_mem}'"))
+        logger.info(f"[reindex] building {HNSW_INDEX} ({INDEX_OPS})")
+        conn.execute(text(hnsw_index_sql(concurrently=True)))
+        if settings.RECALL_HYBRID:
+            logger.info(f"[reindex] building {LEXICAL_INDEX} (hybrid recall)")
+            conn.execute(text(lexical_index_sql(concurrently=True)))
+        if not keep_old:
+            for name in LEGACY_INDEXES:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        conn.execute(text("ANALYZE memories"))
+    logger.info("[reindex] done")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--keep-old", action="store_true")
+    ap.add_argument("--maintenance-work-mem", default="1GB")
+    args = ap.parse_args()
+    main(args.keep_old, args.maintenance_work_mem)
@@ -1,51 +1,426 @@
 from __future__ import annotations
-from typing import List, Tuple, Dict, Any
+import json, hashlib, re
+from functools import lru_cache
+from datetime import datetime
+from typing import List, Dict, Any, NamedTuple
+import numpy as np
 from sqlalchemy import text
-from app.db.base import SessionLocal, engine
-
-# ilk boot’ta tablo/vectors uzantısı
-def ensure_schema():
-    with engine.begin() as conn:
-        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
-        conn.execute(text("""
-        CREATE TABLE IF NOT EXISTS users (
-            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
-            email TEXT UNIQUE NOT NULL,
-            password_hash TEXT NOT NULL DEFAULT ''
-        )
-        """))
-        conn.execute(text("""
-        CREATE TABLE IF NOT EXISTS memories (
-            id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
-            user_id UUID NOT NULL,
-            kind TEXT NOT NULL,
-            content TEXT NOT NULL,
-            embedding vector(1536) NOT NULL,
-            meta JSONB NOT NULL DEFAULT '{}'::jsonb,
-            created_at TIMESTAMPTZ NOT NULL DEFAULT now()
-        )
-        """))
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_mem_user ON memories(user_id)"))
-        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_mem_embed ON memories USING ivfflat (embedding vector_l2_ops)"))
-ensure_schema()
-
-def upsert_memory(user_id: str, kind: str, content: str, emb: list[float], meta: Dict[str, Any]):
-    vec = "[" + ",".join(f"{x:.8f}" for x in emb) + "]"
-    with SessionLocal() as db:
-        db.execute(text("""
-            INSERT INTO memories (user_id, kind, content, embedding, meta)
-            VALUES (:uid, :k, :c, CAST(:e AS vector), CAST(:m AS jsonb))
-        """), {"uid": user_id, "k": kind, "c": content, "e": vec, "m": meta})
-        db.commit()
-
-def search_memories(user_id: str, query_emb: list[float], k: int = 5, max_dist: float = 0.4) -> List[Tuple[str, Dict[str, Any]]]:
-    vec = "[" + ",".join(f"{x:.8f}" for x in query_emb) + "]"
-    with SessionLocal() as db:
-        rows = db.execute(text("""
-            SELECT content, meta, (embedding <-> CAST(:q AS vector)) AS dist
+from app.db.base import AsyncSessionLocal
+from app.db import vector
+from app.memory import recall_cache, access
+from app.utils.lru import TTLCache
+from app.utils.logging import timed
+from app.utils import metrics
+from app.config import settings
+
+# metric -> (mesafe operatörü, HNSW opclass); index ve sorgu aynı metriği kullanmalı
+_METRICS = {"l2": ("<->", "vector_l2_ops"), "cosine": ("<=>", "vector_cosine_ops")}
+DIST_OP, INDEX_OPS = _METRICS[settings.RECALL_METRIC]
+
+def metric_dist(l2: float) -> float:
+    """
+    "Aynı fact" eşikleri (MEMORY_DEDUPE_MAX_DIST, COMPACT_MERGE_DIST) birim vektörlerde L2
+    cinsinden verilir; cosine metriğinde 1 - cos = L2²/2'ye çevrilir. Çevrilmeden 0.25,
+    L2'de benzerlik >= 0.97 iken cosine'de >= 0.75 demek olur ve farklı fact'ler birleşir.
+    """
+    return l2 * l2 / 2 if settings.RECALL_METRIC == "cosine" else l2
+HNSW_INDEX = "idx_mem_embed_hnsw"
+# eski şemalardaki ivfflat indexleri (reindex bunları düşürür)
+LEGACY_INDEXES = ("idx_mem_embed", "idx_mem_vec")
+
+def hnsw_index_sql(concurrently: bool = False) -> str:
+    c = "CONCURRENTLY " if concurrently else ""
+    return (f"CREATE INDEX {c}IF NOT EXISTS {HNSW_INDEX} ON memories "
+            f"USING hnsw (embedding {INDEX_OPS}) WITH (m = 16, ef_construction = 64)")
+
+# kompakt ANN: float16 (halfvec) ve istenirse ilk N boyut (text-embedding-3 Matryoshka).
+# Ayrı kolon yok; index bir expression üzerinde, sorgu aynı ifadeyi kullanmalı.
+COMPACT_INDEX = "idx_mem_embed_compact"
+COMPACT_OPS = INDEX_OPS.replace("vector_", "halfvec_")
+
+def compact_expr(col: str, dims: int | None = None) -> str:
+    dims = settings.RECALL_COMPACT_DIMS if dims is None else dims
+    if dims >= 1536:
+        return f"({col})::halfvec(1536)"
+    return f"subvector({col}, 1, {dims})::halfvec({dims})"
+
+def compact_index_sql(dims: int | None = None, concurrently: bool = False) -> str:
+    c = "CONCURRENTLY " if concurrently else ""
+    return (f"CREATE INDEX {c}IF NOT EXISTS {COMPACT_INDEX} ON memories "
+            f"USING hnsw (({compact_expr('embedding', dims)}) {COMPACT_OPS}) WITH (m = 16, ef_construction = 64)")
+
+
+class Memory(NamedTuple):
+    content: str
+    meta: Dict[str, Any]
+    dist: float | None
+    created_at: datetime | None
+    id: str | None = None
+
+def _memories(rows, max_dist: float) -> List[Memory]:
+    out = []
+    for r in rows:
+        dist = r.dist
+        if dist is not None and dist > max_dist:
+            # hybrid: token eşleşmesiyle gelen satır gevşetilmiş eşiğe kadar kalır
+            lexical = getattr(r, "lr", None) is not None
+            if not lexical or dist > max_dist * settings.RECALL_LEXICAL_DIST_SLACK:
+                continue
+        out.append(Memory(r.content, r.meta, dist, r.created_at, str(r.id)))
+    return out
+
+def content_hash(content: str) -> str:
+    norm = " ".join((content or "").lower().split())
+    return hashlib.sha256(norm.encode("utf-8")).hexdigest()
+
+# aynı fact tekrar geldiğinde yeni satır yerine mevcut satırı tazeler
+_REFRESH_META = """
+    {t}.meta || jsonb_build_object(
+        'seen', LEAST(COALESCE(({t}.meta->>'seen')::bigint, 1) + 1, 2147483647),
+        'last_seen', now(),
+        'score', GREATEST(COALESCE(({t}.meta->>'score')::float, 0), :score)
+    )
+"""
+
+_INSERT_SQL = text(f"""
+    INSERT INTO memories (user_id, kind, content, embedding, meta, content_hash)
+    VALUES (:uid, :k, :c, CAST(:e AS vector), CAST(:m AS jsonb), :h)
+    ON CONFLICT (user_id, content_hash) DO UPDATE
+    SET meta = {_REFRESH_META.format(t="memories")}
+""")
+
+# yakın eşleşme: fact güncellenmiş olabilir ("28 yaşında" -> "29 yaşında"), satır yeni
+# adayın metni/embedding'iyle değişir; yeni hash başka bir satırda varsa yalnız meta tazelenir
+_REPLACE_SQL = text(f"""
+    UPDATE memories SET
+        meta = {_REFRESH_META.format(t="memories")},
+        content = CASE WHEN x.taken THEN memories.content ELSE :c END,
+        embedding = CASE WHEN x.taken THEN memories.embedding ELSE CAST(:e AS vector) END,
+        content_hash = CASE WHEN x.taken THEN memories.content_hash ELSE :h END
+    FROM (SELECT EXISTS (
+        SELECT 1 FROM memories WHERE user_id = :uid AND content_hash = :h AND id <> :id
+    ) AS taken) x
+    WHERE memories.id = :id
+""")
+
+# SQL'de cast edilen (retention, erişim sayaçları, dedupe) meta anahtarları; dışarıdan
+# gelen meta'da tipleri zorlanır, çevrilemeyen değer atılır (tek kötü satır batch'i düşürmesin)
+def _as_score(v) -> float:
+    f = float(v)
+    if f != f:  # NaN
+        raise ValueError("nan")
+    return max(0.0, min(1.0, f))
+
+# SQL tarafı ::int ile okur; taşan tek satır access flush'ının toplu UPDATE'ini düşürür
+_INT_MAX = 2 ** 31 - 1
+
+def _as_count(v) -> int:
+    if isinstance(v, bool):
+        raise ValueError("bool")
+    return max(0, min(_INT_MAX, int(v)))
+
+def _as_ts(v) -> str:
+    return datetime.fromisoformat(str(v)).isoformat()
+
+_RESERVED_META = {"score": _as_score, "seen": _as_count, "hits": _as_count, "merged": _as_count,
+                  "last_seen": _as_ts, "last_hit": _as_ts}
+
+def clean_meta(meta: Any) -> Dict[str, Any]:
+    if not isinstance(meta, dict):
+        return {}
+    out = dict(meta)
+    for key, conv in _RESERVED_META.items():
+        if key in out:
+            try:
+                out[key] = conv(out[key])
+            except (TypeError, ValueError, OverflowError):
+                out.pop(key)
+    return out
+
+def _row_params(user_id: str, it: Dict[str, Any]) -> Dict[str, Any]:
+    meta = clean_meta(it.get("meta"))
+    return {"uid": user_id, "k": it["kind"], "c": it["content"],
+            "e": vector.to_param(it["emb"]), "m": json.dumps(meta),
+            "h": content_hash(it["content"]), "score": float(meta.get("score", 0))}
+
+def _nearest_sql(n: int):
+    # her aday için kullanıcının en yakın hafızası; tek round-trip
+    values = ", ".join(f"({i}, CAST(:q{i} AS vector))" for i in range(n))
+    return text(f"""
+        SELECT q.i, m.id, m.dist
+        FROM (VALUES {values}) AS q(i, e)
+        CROSS JOIN LATERAL (
+            SELECT id, (embedding {DIST_OP} q.e) AS dist
             FROM memories
             WHERE user_id = :uid
-            ORDER BY dist ASC
-            LIMIT :k
-        """), {"uid": user_id, "q": vec, "k": k}).all()
-        return [(r.content, r.meta) for r in rows if r.dist is None or r.dist <= max_dist]
\ No newline at end of file
+            ORDER BY embedding {DIST_OP} q.e
+            LIMIT 1
+        ) m
+        WHERE m.dist <= :maxd
+    """)
+
+def _kind_filter(kinds: bool) -> str:
+    return " AND kind = ANY(CAST(:kinds AS text[]))" if kinds else ""
+
+# ANN: HNSW index + (oturumda açık) iterative scan, user_id filtresiyle yeterli aday bulur
+@lru_cache(maxsize=None)
+def _search_ann_sql(kinds: bool = False):
+    return text(f"""
+        SELECT id, content, meta, created_at, (embedding {DIST_OP} CAST(:q AS vector)) AS dist
+        FROM memories
+        WHERE user_id = :uid{_kind_filter(kinds)}
+        ORDER BY dist ASC
+        LIMIT :k
+    """)
+
+# kompakt ANN + rescoring: küçük index'ten k*factor aday, tam vektörle kesin sıralama
+@lru_cache(maxsize=None)
+def _search_compact_sql(dims: int | None = None, kinds: bool = False):
+    return text(f"""
+        WITH c AS (
+            SELECT id, content, meta, created_at, embedding
+            FROM memories
+            WHERE user_id = :uid{_kind_filter(kinds)}
+            ORDER BY {compact_expr("embedding", dims)} {DIST_OP} {compact_expr("CAST(:q AS vector)", dims)}
+            LIMIT :cand
+        )
+        SELECT id, content, meta, created_at, (embedding {DIST_OP} CAST(:q AS vector)) AS dist
+        FROM c
+        ORDER BY dist ASC
+        LIMIT :k
+    """)
+
+# exact: MATERIALIZED CTE planner'ın ANN index'i seçmesini engeller; idx_mem_user
+# ile kullanıcının satırları alınıp tam sıralanır (az hafızalı kullanıcıda hem hızlı hem tam)
+@lru_cache(maxsize=None)
+def _search_exact_sql(kinds: bool = False):
+    return text(f"""
+        WITH m AS MATERIALIZED (
+            SELECT id, content, meta, created_at, embedding FROM memories
+            WHERE user_id = :uid{_kind_filter(kinds)}
+        )
+        SELECT id, content, meta, created_at, (embedding {DIST_OP} CAST(:q AS vector)) AS dist
+        FROM m
+        ORDER BY dist ASC
+        LIMIT :k
+    """)
+
+_SEARCH_ANN_SQL = _search_ann_sql()
+_SEARCH_COMPACT_SQL = _search_compact_sql()
+_SEARCH_EXACT_SQL = _search_exact_sql()
+
+# --- hybrid: full-text (GIN) + vektör sıralaması, reciprocal-rank fusion, tek sorgu ---
+# 'simple' sözlüğü: kök bulma yok, isim/yaş/şirket gibi tam token'lar olduğu gibi eşleşir
+TS_CONFIG = "simple"
+LEXICAL_INDEX = "idx_mem_content_tsv"
+_TSV = f"to_tsvector('{TS_CONFIG}', content)"
+
+def lexical_index_sql(concurrently: bool = False) -> str:
+    c = "CONCURRENTLY " if concurrently else ""
+    return f"CREATE INDEX {c}IF NOT EXISTS {LEXICAL_INDEX} ON memories USING gin ({_TSV})"
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# 'simple' sözlüğü stopword atmaz; OR'lu sorguda bunlar her hafızayla eşleşir
+_STOPWORDS = frozenset("""
+    the and are you your yours was were been being have has had does did doing can could would
+    should will shall may might must not but for with without this that these those there here
+    what when where which who whom why how all any some just very too also about into from then
+    than them they their our ours she her his him its out off over under again more most much
+    such only own same other each few nor yes okay thanks thank please hello today tomorrow
+    help need want know tell like get make think going really well good fine nice let
+    ben sen biz siz onlar bana sana beni seni benim senin bizim sizin onun bunu şunu bunlar
+    şunlar için ile gibi kadar daha çok az var yok değil evet hayır tamam merhaba selam
+    teşekkürler teşekkür lütfen nasıl neden niye nerede ne zaman şey şimdi sonra önce bugün
+    yarın ama fakat veya ya da hem mi mı mu mü bir iki her hiç nasılsın misin mısın musun
+    müsün eder edebilir edersin yapar yardım iyi güzel
+""".split())
+
+def lexical_query(message: str, max_terms: int = 16) -> str | None:
+    """
+    Mesaj token'larından OR'lu tsquery; kısa kelimeler (sayılar hariç) ve stopword'ler
+    elenir. Genel sohbet mesajı ("how are you today") None döner -> yalnız vektör.
+    """
+    seen, terms = set(), []
+    for tok in _TOKEN_RE.findall(message or ""):
+        tok = tok.strip("_")
+        if not tok or (len(tok) < 3 and not tok.isdigit()):
+            continue
+        key = tok.casefold()
+        if key in _STOPWORDS:
+            continue
+        if key not in seen:
+            seen.add(key)
+            terms.append(tok)
+        if len(terms) >= max_terms:
+            break
+    return " | ".join(terms) if terms else None
+
+@lru_cache(maxsize=None)
+def _search_hybrid_sql(mode: str, kinds: bool = False):
+    kf = _kind_filter(kinds)
+    order = f"embedding {DIST_OP} CAST(:q AS vector)"
+    if mode == "exact":
+        # exact yoldaki gibi: ANN index'i devre dışı, kullanıcının satırları tam sıralanır
+        pre = f"b AS MATERIALIZED (SELECT id, embedding FROM memories WHERE user_id = :uid{kf}),"
+        src = "b"
+    else:
+        pre, src = "", f"memories WHERE user_id = :uid{kf}"
+        if mode == "compact":
+            order = f"{compact_expr('embedding')} {DIST_OP} {compact_expr('CAST(:q AS vector)')}"
+    return text(f"""
+        WITH {pre}
+        v AS (
+            SELECT id, row_number() OVER (ORDER BY d) AS r
+            FROM (SELECT id, {order} AS d FROM {src} ORDER BY d LIMIT :cand) s
+        ),
+        l AS (
+            SELECT id, row_number() OVER (ORDER BY rank DESC) AS r
+            FROM (
+                SELECT id, ts_rank_cd({_TSV}, tq) AS rank
+                FROM memories, to_tsquery('{TS_CONFIG}', :tsq) tq
+                WHERE user_id = :uid{kf} AND {_TSV} @@ tq
+                ORDER BY rank DESC
+                LIMIT :cand
+            ) s
+        ),
+        f AS (
+            SELECT COALESCE(v.id, l.id) AS id, l.r AS lr,
+                   COALESCE(1.0 / (:rrf + v.r), 0) + COALESCE(1.0 / (:rrf + l.r), 0) AS score
+            FROM v FULL OUTER JOIN l ON v.id = l.id
+        )
+        SELECT m.id, m.content, m.meta, m.created_at, f.lr,
+               (m.embedding {DIST_OP} CAST(:q AS vector)) AS dist
+        FROM f JOIN memories m ON m.id = f.id
+        ORDER BY f.score DESC
+        LIMIT :k
+    """)
+
+# sınırlı sayım: büyük kullanıcıda tüm satırları saymaz, eşik+1'de durur
+_COUNT_SQL = text("""
+    SELECT count(*) FROM (SELECT 1 FROM memories WHERE user_id = :uid LIMIT :cap) t
+""")
+_counts: TTLCache[int] = TTLCache(100_000, ttl=300)
+
+def _on_write(user_id: str) -> None:
+    # yazma sonrası: sayım ve recall cache'i bu kullanıcı için geçersiz
+    _counts.pop(user_id)
+    recall_cache.bump(user_id)
+
+def _mode(n: int | None) -> str:
+    if settings.RECALL_STRATEGY == "exact":
+        return "exact"
+    if settings.RECALL_STRATEGY == "auto" and n is not None and n <= settings.RECALL_EXACT_MAX_ROWS:
+        return "exact"
+    return "compact" if settings.RECALL_COMPACT else "ann"
+
+def _search(n: int | None, user_id: str, query_emb: list[float], k: int,
+            kinds: List[str] | None, tsq: str | None):
+    mode, kf = _mode(n), bool(kinds)
+    p: Dict[str, Any] = {"uid": user_id, "q": vector.to_param(query_emb), "k": k}
+    if kf:
+        p["kinds"] = list(kinds)
+    if tsq:
+        p.update(tsq=tsq, rrf=settings.RECALL_RRF_K, cand=k * max(1, settings.RECALL_HYBRID_FACTOR))
+        return _search_hybrid_sql(mode, kf), p
+    if mode == "exact":
+        return _search_exact_sql(kf), p
+    if mode == "compact":
+        p["cand"] = k * max(1, settings.RECALL_RESCORE_FACTOR)
+        return _search_compact_sql(None, kf), p
+    return _search_ann_sql(kf), p
+
+def _tsq(query_text: str | None) -> str | None:
+    return lexical_query(query_text) if settings.RECALL_HYBRID and query_text else None
+
+def _needs_count() -> bool:
+    return settings.RECALL_STRATEGY == "auto"
+
+def _dist(a: np.ndarray, b: np.ndarray) -> float:
+    if settings.RECALL_METRIC == "cosine":
+        na, nb = float(np.linalg.norm(a)), float(np.linalg.norm(b))
+        return 1.0 - float(a @ b) / (na * nb) if na and nb else 1.0
+    return float(np.linalg.norm(a - b))
+
+def _collapse(params: List[Dict[str, Any]], max_dist: float) -> List[Dict[str, Any]]:
+    """Batch içi yakın kopyalar teke iner; sonraki (daha yeni) aday kalır, skor en yükseği."""
+    kept: List[Dict[str, Any]] = []
+    for p in params:
+        for i, k in enumerate(kept):
+            if _dist(p["e"], k["e"]) <= max_dist:
+                kept[i] = {**p, "score": max(p["score"], k["score"])}
+                break
+        else:
+            kept.append(p)
+    return kept
+
+async def upsert_memories_async(user_id: str, items: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    items = [{kind, content, emb, meta}, ...] -> tek transaction, tek commit.
+    1) batch içi aynı hash'ler ve MEMORY_DEDUPE_MAX_DIST içindeki yakın kopyalar teke iner
+    2) tek sorguyla her adayın en yakın mevcut hafızası bulunur; eşik içindeyse yeni satır
+       açılmaz, o satır adayın metni/embedding'iyle güncellenir (seen/last_seen/score tazelenir)
+    3) kalanlar ON CONFLICT (user_id, content_hash) ile eklenir/tazelenir
+    """
+    uniq: Dict[str, Dict[str, Any]] = {}
+    for it in items:
+        uniq[content_hash(it["content"])] = it
+    params = [_row_params(user_id, it) for it in uniq.values()]
+    if not params:
+        return {"inserted": 0, "merged": 0}
+    maxd = metric_dist(settings.MEMORY_DEDUPE_MAX_DIST)
+    if maxd > 0:
+        params = _collapse(params, maxd)
+
+    async with AsyncSessionLocal() as db:
+        near: Dict[int, Any] = {}
+        if maxd > 0:
+            q = {f"q{i}": p["e"] for i, p in enumerate(params)}
+            rows = (await db.execute(_nearest_sql(len(params)), {**q, "uid": user_id, "maxd": maxd})).all()
+            near = {r.i: r.id for r in rows}
+        # aynı satıra düşen birden çok adaydan sonuncusu yazılır
+        by_row: Dict[Any, Dict[str, Any]] = {}
+        for i, p in enumerate(params):
+            if i in near:
+                by_row[near[i]] = {**p, "id": near[i]}
+        merged = list(by_row.values())
+        fresh = [p for i, p in enumerate(params) if i not in near]
+        if merged:
+            await db.execute(_REPLACE_SQL, merged)
+        if fresh:
+            await db.execute(_INSERT_SQL, fresh)
+        await db.commit()
+    _on_write(user_id)
+    return {"inserted": len(fresh), "merged": len(merged)}
+
+async def search_memories_async(user_id: str, query_emb: list[float], k: int = 5, max_dist: float = 0.4,
+                                kinds: List[str] | None = None, query_text: str | None = None) -> List[Memory]:
+    """
+    query_text verilirse (RECALL_HYBRID=1) vektör + full-text sıralaması RRF ile birleşir;
+    kinds verilirse yalnız o türler aranır.
+    """
+    tsq = _tsq(query_text)
+    ck = (recall_cache.key(user_id, query_emb, k, max_dist, tuple(sorted(kinds or ())), tsq)
+          if recall_cache.enabled() else None)
+    if ck is not None:
+        hit = recall_cache.get(ck)
+        metrics.inc("recall_cache", result="hit" if hit is not None else "miss")
+        if hit is not None:
+            access.record(hit)
+            return hit
+    with timed("db"), metrics.timer("recall_seconds"):
+        async with AsyncSessionLocal() as db:
+            with metrics.timer("db_checkout_seconds"):
+                await db.connection()
+            n = _counts.get(user_id)
+            if n is None and _needs_count():
+                n = (await db.execute(_COUNT_SQL, {"uid": user_id, "cap": settings.RECALL_EXACT_MAX_ROWS + 1})).scalar_one()
+                _counts.put(user_id, n)
+            sql, params = _search(n, user_id, query_emb, k, kinds, tsq)
+            rows = (await db.execute(sql, params)).all()
+    out = _memories(rows, max_dist)
+    access.record(out)
+    metrics.observe("recall_results", len(out))
+    if ck is not None:
+        recall_cache.put(ck, out)
+    return out
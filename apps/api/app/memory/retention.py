@@ -0,0 +1,260 @@
+"""
+Hafıza bakımı: yaşlanan düşük skorlu `note`ları siler, anlamca yakın hafızaları birleştirir.
+
+    python -m app.memory.retention                  # tüm kullanıcılar, sırayla
+    python -m app.memory.retention --user <uuid>    # tek kullanıcı
+    python -m app.memory.retention --enqueue        # her kullanıcı için `memory_compaction` işi (JOBS_MODE=pg)
+    python -m app.memory.retention --dry-run        # yalnız say
+
+Cron/zamanlanmış görev olarak `--enqueue` önerilir: işler worker'da arka plan
+önceliğiyle koşar. Her adım COMPACT_BATCH'lik parçalarla ilerler, parçalar arası
+COMPACT_PAUSE beklenir (DB ve upstream'i kullanıcı trafiğine karşı korur).
+"""
+from __future__ import annotations
+import argparse, asyncio, json, logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Tuple
+from sqlalchemy import text
+from app.db.base import AsyncSessionLocal
+from app.db import base as db_base
+from app.db import vector
+from app.upstream import client as upstream
+from app.upstream import gateway
+from app.jobs import queue as jobs
+from app.memory.repo import DIST_OP, content_hash, metric_dist, _on_write, _INT_MAX
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# decay: skor * exp(-yaş/RETAIN_DECAY_DAYS) + erişim bonusu; son temas (yaratılma,
+# tekrar görülme, recall) RETAIN_NOTE_DAYS'ten eskiyse ve eşik altındaysa silinir
+_EXPIRABLE = """
+    SELECT id FROM memories
+    WHERE user_id = :uid AND kind = 'note'
+      AND GREATEST(created_at,
+                   COALESCE((meta->>'last_seen')::timestamptz, created_at),
+                   COALESCE((meta->>'last_hit')::timestamptz, created_at))
+          < now() - :age * interval '1 day'
+      AND COALESCE((meta->>'score')::float, 0.5)
+          * exp(-EXTRACT(EPOCH FROM now() - created_at) / 86400.0 / :decay)
+          + 0.05 * COALESCE((meta->>'hits')::int, 0) < :min
+"""
+_EXPIRE_SQL = text(f"DELETE FROM memories WHERE id IN ({_EXPIRABLE} LIMIT :batch)")
+_EXPIRE_COUNT_SQL = text(f"SELECT count(*) FROM ({_EXPIRABLE}) t")
+
+_IDS_SQL = text("""
+    SELECT id FROM memories WHERE user_id = :uid AND id > CAST(:after AS uuid) ORDER BY id LIMIT :batch
+""")
+
+# parçadaki her hafızanın aynı türdeki en yakın komşuları (index destekli)
+_NEIGHBORS_SQL = text(f"""
+    SELECT b.id AS a, n.id AS b, n.dist
+    FROM memories b
+    CROSS JOIN LATERAL (
+        SELECT m.id, (m.embedding {DIST_OP} b.embedding) AS dist
+        FROM memories m
+        WHERE m.user_id = :uid AND m.kind = b.kind AND m.id <> b.id
+        ORDER BY m.embedding {DIST_OP} b.embedding
+        LIMIT 4
+    ) n
+    WHERE b.id = ANY(CAST(:ids AS uuid[])) AND n.dist <= :maxd
+""")
+
+_ROWS_SQL = text("""
+    SELECT id, kind, content, meta, created_at FROM memories WHERE id = ANY(CAST(:ids AS uuid[]))
+""")
+_DELETE_SQL = text("DELETE FROM memories WHERE id = ANY(CAST(:ids AS uuid[]))")
+_KEEP_SQL = text("UPDATE memories SET meta = CAST(:m AS jsonb) WHERE id = :id")
+_REWRITE_SQL = text("""
+    UPDATE memories SET meta = CAST(:m AS jsonb), content = :c, embedding = :e, content_hash = :h
+    WHERE id = :id
+""")
+
+CONSOLIDATE_PROMPT = (
+    "These statements describe the same fact about a user. Merge them into one short, "
+    "self-contained statement in the language they are written in. Reply with the statement only."
+)
+
+async def expire(user_id: str, dry_run: bool = False) -> int:
+    params = {"uid": user_id, "age": settings.RETAIN_NOTE_DAYS, "decay": settings.RETAIN_DECAY_DAYS,
+              "min": settings.RETAIN_MIN_SCORE, "batch": settings.COMPACT_BATCH}
+    if dry_run:
+        async with AsyncSessionLocal() as db:
+            return (await db.execute(_EXPIRE_COUNT_SQL, params)).scalar_one()
+    total = 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            n = (await db.execute(_EXPIRE_SQL, params)).rowcount
+            await db.commit()
+        total += n
+        if n < settings.COMPACT_BATCH:
+            return total
+        await asyncio.sleep(settings.COMPACT_PAUSE)
+
+async def _pairs(user_id: str) -> List[Tuple[str, str, float]]:
+    out: List[Tuple[str, str, float]] = []
+    after = "00000000-0000-0000-0000-000000000000"
+    while True:
+        async with AsyncSessionLocal() as db:
+            ids = [str(r.id) for r in (await db.execute(
+                _IDS_SQL, {"uid": user_id, "after": after, "batch": settings.COMPACT_BATCH}))]
+            if not ids:
+                return out
+            rows = (await db.execute(_NEIGHBORS_SQL, {"uid": user_id, "ids": ids,
+                                                      "maxd": metric_dist(settings.COMPACT_MERGE_DIST)})).all()
+        out.extend((str(r.a), str(r.b), r.dist) for r in rows)
+        after = ids[-1]
+        if len(ids) < settings.COMPACT_BATCH:
+            return out
+        await asyncio.sleep(settings.COMPACT_PAUSE)
+
+def clusters(pairs: List[Tuple[str, str, float]]) -> List[List[str]]:
+    """
+    Yıldız kümeleme: en yakın çiftten başlayarak; her üye merkezine COMPACT_MERGE_DIST
+    içinde kalır (union-find'ın A~B~C zincirleriyle uzak hafızaları birleştirmesini önler).
+    """
+    center: Dict[str, str] = {}
+    groups: Dict[str, List[str]] = {}
+    for a, b, _ in sorted(pairs, key=lambda p: p[2]):
+        if a in center and b in center:
+            continue
+        if a not in center and b not in center:
+            center[a] = center[b] = a
+            groups[a] = [a, b]
+        elif center.get(a) == a and b not in center:
+            center[b] = a
+            groups[a].append(b)
+        elif center.get(b) == b and a not in center:
+            center[a] = b
+            groups[b].append(a)
+    return list(groups.values())
+
+def _touched(r) -> datetime:
+    """Satırın son teması: yaratılma ya da son tekrar görülme (naive zaman UTC sayılır)."""
+    ts = [r.created_at]
+    try:
+        if (r.meta or {}).get("last_seen"):
+            ts.append(datetime.fromisoformat(str(r.meta["last_seen"])))
+    except ValueError:
+        pass
+    return max(t if t.tzinfo else t.replace(tzinfo=timezone.utc) for t in ts)
+
+def _merged_meta(rows, by_recency: bool = True) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Kalacak satır ve birleşik meta. LLM birleştirmesi yoksa metin değişmez; kümede fact
+    güncellenmiş olabilir ("28 yaşında" -> "29 yaşında"), bu yüzden en son temas edilen
+    satır kalır. LLM varsa metin yeniden yazılır, en ağır (skor/seen/hits) satır taşıyıcıdır.
+    """
+    def weight(r):
+        m = r.meta or {}
+        return (float(m.get("score", 0)), int(m.get("seen", 1)), int(m.get("hits", 0)), r.created_at)
+    keep = max(rows, key=_touched if by_recency else weight)
+    metas = [r.meta or {} for r in rows]
+    meta = {
+        **(keep.meta or {}),
+        "score": max(float(m.get("score", 0)) for m in metas),
+        "seen": min(_INT_MAX, sum(int(m.get("seen", 1)) for m in metas)),
+        "hits": min(_INT_MAX, sum(int(m.get("hits", 0)) for m in metas)),
+        "merged": min(_INT_MAX, sum(int(m.get("merged", 1)) for m in metas)),
+    }
+    if any(m.get("last_seen") for m in metas):
+        meta["last_seen"] = max(_touched(r) for r in rows).isoformat()
+    return keep, meta
+
+async def _consolidated_text(rows) -> Tuple[str, Any] | None:
+    # geç import: chat.routes handler kayıtlarını da getirir, CLI'da yalnız gerekince
+    from app.chat.routes import chat_completion
+    from app.memory.embeddings import embed_texts
+    listing = "\n".join(f"- {r.content}" for r in rows)
+    out = (await chat_completion([
+        {"role": "system", "content": CONSOLIDATE_PROMPT},
+        {"role": "user", "content": listing},
+    ], temperature=0.0, model=settings.OPENAI_EXTRACT_MODEL)).strip()
+    if len(out) < 10:
+        return None
+    return out, (await embed_texts([out]))[0]
+
+async def consolidate(user_id: str, dry_run: bool = False) -> Dict[str, int]:
+    groups = clusters(await _pairs(user_id))
+    if dry_run:
+        return {"clusters": len(groups), "removed": sum(len(g) - 1 for g in groups)}
+    removed = failed = 0
+    for ids in groups:
+        try:
+            # okuma ve (opsiyonel) LLM birleştirmesi bağlantı tutmadan; yazma tek kısa transaction
+            async with AsyncSessionLocal() as db:
+                rows = (await db.execute(_ROWS_SQL, {"ids": ids})).all()
+            if len(rows) < 2:
+                continue
+            keep, meta = _merged_meta(rows, by_recency=not settings.COMPACT_LLM)
+            rewrite = await _consolidated_text(rows) if settings.COMPACT_LLM else None
+            async with AsyncSessionLocal() as db:
+                if rewrite:
+                    content, emb = rewrite
+                    res = await db.execute(_REWRITE_SQL, {"id": keep.id, "m": json.dumps(meta, default=str),
+                                                          "c": content, "e": vector.to_param(emb),
+                                                          "h": content_hash(content)})
+                else:
+                    res = await db.execute(_KEEP_SQL, {"id": keep.id, "m": json.dumps(meta, default=str)})
+                if res.rowcount != 1:  # bu arada silinmiş
+                    continue
+                gone = (await db.execute(_DELETE_SQL, {"ids": [r.id for r in rows if r.id != keep.id]})).rowcount
+                await db.commit()
+            removed += gone
+        except Exception as e:
+            # ör. yeniden yazılan metnin hash'i başka bir satırla çakıştı; küme olduğu gibi kalır
+            failed += 1
+            logger.warning(f"[retention] uid={user_id} cluster of {len(ids)} skipped: {e}")
+        await asyncio.sleep(settings.COMPACT_PAUSE)
+    return {"clusters": len(groups), "removed": removed, "failed": failed}
+
+@jobs.handler("memory_compaction")
+async def compact_user(user_id: str, dry_run: bool = False) -> Dict[str, Any]:
+    res = {"expired": await expire(user_id, dry_run), **(await consolidate(user_id, dry_run))}
+    if not dry_run and (res["expired"] or res["removed"]):
+        _on_write(user_id)
+    logger.info(f"[retention] uid={user_id} {res}")
+    return res
+
+_USERS_SQL = text("""
+    SELECT DISTINCT user_id::text AS uid FROM memories WHERE user_id > CAST(:after AS uuid) ORDER BY 1 LIMIT :n
+""")
+
+async def _users(limit: int | None):
+    after, seen = "00000000-0000-0000-0000-000000000000", 0
+    while True:
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(_USERS_SQL, {"after": after, "n": 500})).all()
+        for r in rows:
+            if limit is not None and seen >= limit:
+                return
+            seen += 1
+            yield r.uid
+        if len(rows) < 500:
+            return
+        after = rows[-1].uid
+
+async def main(user: str | None, limit: int | None, enqueue: bool, dry_run: bool) -> None:
+    if enqueue and settings.JOBS_MODE != "pg":
+        raise SystemExit("--enqueue requires JOBS_MODE=pg")
+    try:
+        users = [user] if user else [u async for u in _users(limit)]
+        for uid in users:
+            if enqueue:
+                await jobs.submit("memory_compaction", {"user_id": uid, "dry_run": dry_run})
+            else:
+                with gateway.background():
+                    await compact_user(uid, dry_run)
+    finally:
+        await upstream.close()
+        await db_base.dispose()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--user")
+    ap.add_argument("--limit", type=int, help="en fazla bu kadar kullanıcı")
+    ap.add_argument("--enqueue", action="store_true")
+    ap.add_argument("--dry-run", action="store_true")
+    args = ap.parse_args()
+    asyncio.run(main(args.user, args.limit, args.enqueue, args.dry_run))
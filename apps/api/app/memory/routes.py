@@ -1,28 +1,45 @@
 from __future__ import annotations
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.memory.repo import upsert_memory, search_memories
+from app.auth.dep import get_current_user
+from app.memory.repo import upsert_memories_async
+from app.memory.embeddings import embed_texts
+from app.memory import bulk
 from app.config import settings
-import jwt
 
 router = APIRouter(prefix="/memory", tags=["memory"])
 
-def get_current_user(authorization: str = Header(None)):
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(401, "Missing token")
-    token = authorization.split(" ", 1)[1]
-    try:
-        payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
-    except jwt.PyJWTError:
-        raise HTTPException(401, "Invalid token")
-    return type("User", (), {"id": payload.get("sub")})
-
 class UpsertIn(BaseModel):
     kind: str
     content: str
     meta: dict = {}
 
 @router.post("/upsert")
-def upsert(payload: UpsertIn, user=Depends(get_current_user)):
-    # burada embed’i FE veriyorsa kabul edebilirdik; şimdilik sadece text alıyoruz
-    raise HTTPException(501, "Use /chat/complete for automatic memory")
\ No newline at end of file
+async def upsert(payload: UpsertIn, user=Depends(get_current_user)):
+    content = payload.content.strip()
+    if not content:
+        raise HTTPException(422, "content is empty")
+    if not settings.OPENAI_API_KEY:
+        raise HTTPException(500, "OPENAI_API_KEY missing")
+    emb = (await embed_texts([content]))[0]
+    return await upsert_memories_async(user.id, [
+        {"kind": payload.kind, "content": content, "emb": emb,
+         "meta": {"source": "api", **payload.meta}}
+    ])
+
+@router.post("/import")
+async def import_memories(request: Request, user=Depends(get_current_user)):
+    """
+    Gövde NDJSON: satır başına {"kind", "content", "meta"?, "embedding"?}.
+    `embedding` (1536 boyut) verilen satırlar embed edilmez (taşıma için).
+    """
+    return await bulk.import_ndjson(user.id, request.stream())
+
+@router.get("/export")
+async def export_memories(embeddings: bool = False, user=Depends(get_current_user)):
+    return StreamingResponse(
+        bulk.export_ndjson(user.id, embeddings),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="memories.ndjson"'},
+    )
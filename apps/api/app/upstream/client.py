@@ -0,0 +1,73 @@
+from __future__ import annotations
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+import httpx
+from app.config import settings
+from app.utils.logging import request_id
+from app.upstream import gateway
+
+# Uygulama boyunca yaşayan tek upstream (OpenAI uyumlu) istemci.
+# Keep-alive havuzu + HTTP/2 sayesinde her çağrı yeni TCP/TLS el sıkışması ödemez.
+_client: httpx.AsyncClient | None = None
+
+async def _propagate_request_id(request: httpx.Request) -> None:
+    rid = request_id.get()
+    if rid != "-":
+        request.headers["x-request-id"] = rid
+
+def _build_client() -> httpx.AsyncClient:
+    headers = {}
+    if settings.OPENAI_API_KEY:
+        headers["Authorization"] = f"Bearer {settings.OPENAI_API_KEY}"
+    return httpx.AsyncClient(
+        base_url=settings.OPENAI_API_BASE,
+        headers=headers,
+        http2=settings.UPSTREAM_HTTP2,
+        limits=httpx.Limits(
+            max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+            keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.UPSTREAM_TIMEOUT, connect=settings.UPSTREAM_CONNECT_TIMEOUT),
+        event_hooks={"request": [_propagate_request_id]},
+    )
+
+def get_client() -> httpx.AsyncClient:
+    # lifespan dışında (script/test) çağrılırsa tembel oluştur
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+    return _client
+
+async def start() -> None:
+    get_client()
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _timeout_kw(timeout: float | None) -> dict:
+    if timeout is None:
+        return {}
+    return {"timeout": httpx.Timeout(timeout, connect=settings.UPSTREAM_CONNECT_TIMEOUT)}
+
+async def post(path: str, json: dict, timeout: float | None = None) -> httpx.Response:
+    """Havuzdaki istemciyle POST (gateway: limit/retry/breaker); `timeout` çağrı başına süreyi ezer."""
+    r = await gateway.call(path, lambda: get_client().post(path, json=json, **_timeout_kw(timeout)),
+                           cost=gateway.estimate_tokens(json))
+    r.raise_for_status()
+    return r
+
+@asynccontextmanager
+async def stream(path: str, json: dict, timeout: float | None = None) -> AsyncIterator[httpx.Response]:
+    """Gövdeyi okumadan yanıtı döner (SSE için); bağlantı çıkışta havuza iade edilir."""
+    async with gateway.stream(
+        path, lambda: get_client().stream("POST", path, json=json, **_timeout_kw(timeout)),
+        cost=gateway.estimate_tokens(json),
+    ) as r:
+        if r.is_error:
+            await r.aread()
+            r.raise_for_status()
+        yield r
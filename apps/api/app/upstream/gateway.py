@@ -0,0 +1,305 @@
+from __future__ import annotations
+import asyncio, random, re, time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator
+import httpx
+from fastapi import HTTPException
+from app.config import settings
+from app.utils import metrics
+
+# Upstream kapısı: endpoint başına öncelikli eşzamanlılık sınırı, x-ratelimit-*
+# başlıklarından beslenen token bucket (istek ve token kotası için ayrı), 429'da
+# duraklatma, jitter'lı üstel retry ve circuit breaker.
+# Öncelik contextvar'dan okunur: varsayılan kullanıcı isteği (HIGH); arka plan
+# işleri `with background():` içinde koşar ve slot/rate-limit'te geri planda kalır.
+
+HIGH, LOW = 0, 1
+_priority: ContextVar[int] = ContextVar("upstream_priority", default=HIGH)
+
+@contextmanager
+def background() -> Iterator[None]:
+    tok = _priority.set(LOW)
+    try:
+        yield
+    finally:
+        _priority.reset(tok)
+
+def is_background() -> bool:
+    return _priority.get() == LOW
+
+class UpstreamUnavailable(HTTPException):
+    def __init__(self, detail: str = "Upstream unavailable"):
+        super().__init__(503, detail, headers={"Retry-After": "5"})
+
+class _Limiter:
+    """İki öncelikli semafor: boşalan slot önce HIGH bekleyene gider; LOW en fazla bg_max slot tutar."""
+
+    def __init__(self, size: int, bg_share: float):
+        self.size = size
+        self.bg_max = max(1, int(size * bg_share))
+        self.used = 0
+        self.bg_used = 0
+        self._waiters: Dict[int, deque] = {HIGH: deque(), LOW: deque()}
+
+    def _can(self, prio: int) -> bool:
+        return self.used < self.size and (prio == HIGH or self.bg_used < self.bg_max)
+
+    def _take(self, prio: int) -> None:
+        self.used += 1
+        if prio == LOW:
+            self.bg_used += 1
+
+    async def acquire(self, prio: int) -> None:
+        ahead = self._waiters[HIGH] or (prio == LOW and self._waiters[LOW])
+        if not ahead and self._can(prio):
+            self._take(prio)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[prio].append(fut)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                self.release(prio)  # slot verilmişti, iade et
+            else:
+                try:
+                    self._waiters[prio].remove(fut)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self, prio: int) -> None:
+        self.used -= 1
+        if prio == LOW:
+            self.bg_used -= 1
+        for p in (HIGH, LOW):
+            q = self._waiters[p]
+            while q and self._can(p):
+                fut = q.popleft()
+                if fut.done():
+                    continue
+                self._take(p)
+                fut.set_result(None)
+
+_DUR_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def _parse_reset(v: str | None) -> float:
+    # OpenAI biçimi: "20ms", "1s", "6m0s", "1h2m3.5s"
+    if not v:
+        return 0.0
+    return sum(float(n) * _UNIT[u] for n, u in _DUR_RE.findall(v))
+
+def _int(v: str | None) -> int | None:
+    try:
+        return int(v) if v is not None else None
+    except ValueError:
+        return None
+
+class _Bucket:
+    """
+    Upstream kotasının yerel kopyası. Kapasite/kalan her yanıtta x-ratelimit-limit-* ve
+    remaining-* ile eşitlenir; dolum hızı = açık / reset süresi (boş bucket için limit /
+    pencere). Başlık gelene kadar hız 0'dır ve bucket beklemez.
+    """
+
+    def __init__(self):
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.rate = 0.0  # birim/sn
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        if self.rate > 0:
+            self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def sync(self, limit: int | None, remaining: int | None, reset: float) -> None:
+        if limit is None or remaining is None or limit <= 0:
+            return
+        now = time.monotonic()
+        self.capacity = float(limit)
+        self.tokens = float(remaining)
+        self.stamp = now
+        gap = limit - remaining
+        if gap > 0 and reset > 0:
+            self.rate = gap / reset
+        elif self.rate <= 0:
+            self.rate = limit / 60.0  # OpenAI kotaları dakikalık
+
+    def debit(self, cost: float, reserve: float = 0.0) -> float:
+        """Maliyeti hemen düşer (bakiye eksiye inebilir) ve sıranın gelmesi için gereken bekleme süresini döner."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill(time.monotonic())
+        self.tokens -= cost
+        return max(0.0, (reserve - self.tokens) / self.rate)
+
+class _Endpoint:
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.limiter = _Limiter(size, settings.UPSTREAM_BG_SHARE)
+        self.paused_until = {HIGH: 0.0, LOW: 0.0}
+        self.requests = _Bucket()
+        self.tokens = _Bucket()
+        self.failures = 0
+        self.open_until = 0.0
+        self.probe_until = 0.0
+
+    # --- rate limit ---
+    def observe(self, r: httpx.Response) -> None:
+        h = r.headers
+        self.requests.sync(_int(h.get("x-ratelimit-limit-requests")), _int(h.get("x-ratelimit-remaining-requests")),
+                           _parse_reset(h.get("x-ratelimit-reset-requests")))
+        self.tokens.sync(_int(h.get("x-ratelimit-limit-tokens")), _int(h.get("x-ratelimit-remaining-tokens")),
+                         _parse_reset(h.get("x-ratelimit-reset-tokens")))
+        if r.status_code == 429:
+            reset = max(_parse_reset(h.get("x-ratelimit-reset-requests")),
+                        _parse_reset(h.get("x-ratelimit-reset-tokens")))
+            ra = h.get("retry-after")
+            wait = float(ra) if ra and ra.replace(".", "", 1).isdigit() else max(reset, 1.0)
+            self._pause(HIGH, time.monotonic() + wait)
+
+    def _pause(self, prio: int, until: float) -> None:
+        for p in (HIGH, LOW) if prio == HIGH else (LOW,):
+            self.paused_until[p] = max(self.paused_until[p], until)
+
+    async def wait_rate(self, prio: int, cost: int) -> None:
+        # bakiye çağrıdan önce düşülür; eksiye inen çağıran dolum hızına göre sırasını bekler.
+        # arka plan, kullanıcı isteklerine UPSTREAM_RL_BG_RESERVE istek payı bırakır
+        reserve = settings.UPSTREAM_RL_BG_RESERVE if prio == LOW else 0
+        delay = max(self.paused_until[prio] - time.monotonic(),
+                    self.requests.debit(1, reserve), self.tokens.debit(cost))
+        if delay > 0:
+            metrics.inc("upstream_rate_waits", endpoint=self.path, priority="low" if prio == LOW else "high")
+            await asyncio.sleep(min(delay, settings.UPSTREAM_RL_MAX_WAIT))
+
+    # --- circuit breaker ---
+    def check(self) -> None:
+        # süre dolunca yarı-açık: tek bir deneme isteği geçer, diğerleri sonucunu beklemeden
+        # reddedilir; deneme başarılıysa kapanır, hata verirse tekrar açılır. Sonuçsuz kalan
+        # deneme (iptal) UPSTREAM_TIMEOUT sonra yenisine yer açar.
+        now = time.monotonic()
+        if now < self.open_until:
+            raise UpstreamUnavailable(f"Upstream circuit open: {self.path}")
+        if self.failures >= settings.UPSTREAM_BREAKER_FAILURES:
+            if now < self.probe_until:
+                raise UpstreamUnavailable(f"Upstream circuit half-open: {self.path}")
+            self.probe_until = now + settings.UPSTREAM_TIMEOUT
+
+    def fail(self) -> None:
+        self.failures += 1
+        if self.failures >= settings.UPSTREAM_BREAKER_FAILURES:
+            self.open_until = time.monotonic() + settings.UPSTREAM_BREAKER_COOLDOWN
+            self.probe_until = 0.0
+
+    def ok(self) -> None:
+        self.failures = 0
+        self.probe_until = 0.0
+
+_endpoints: Dict[str, _Endpoint] = {}
+
+def _endpoint(path: str) -> _Endpoint:
+    ep = _endpoints.get(path)
+    if ep is None:
+        size = settings.UPSTREAM_CONCURRENCY_EMBED if path.startswith("/embeddings") else settings.UPSTREAM_CONCURRENCY
+        ep = _endpoints[path] = _Endpoint(path, size)
+    return ep
+
+def estimate_tokens(body: Dict[str, Any]) -> int:
+    """Token kotasından düşülecek kaba tahmin: ~4 karakter/token girdi + istenen azami çıktı."""
+    chars = 0
+    for m in body.get("messages") or ():
+        c = m.get("content")
+        chars += len(c) if isinstance(c, str) else len(str(c or ""))
+    inp = body.get("input")
+    if isinstance(inp, str):
+        chars += len(inp)
+    elif isinstance(inp, list):
+        chars += sum(len(x) if isinstance(x, str) else len(str(x)) for x in inp)
+    out = body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return chars // 4 + int(out)
+
+# istek upstream'e ulaşmadan oluşan taşıma hataları; tekrar denemek güvenli
+_UNSENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+def _retryable(status: int) -> bool:
+    return status == 429 or status >= 500
+
+async def _backoff(attempt: int, path: str) -> None:
+    metrics.inc("upstream_retries", endpoint=path)
+    cap = settings.UPSTREAM_RETRY_MAX_DELAY
+    await asyncio.sleep(random.uniform(0, min(cap, settings.UPSTREAM_RETRY_BASE_DELAY * 2 ** attempt)))
+
+async def _open(ep: _Endpoint, prio: int, cost: int, send: Callable[[], Awaitable[httpx.Response]],
+                discard: Callable[[httpx.Response], Awaitable[None]]) -> httpx.Response:
+    """Slot alır ve isteği retry'larla açar; dönüşte slot çağıranda (release etmeli)."""
+    attempt = 0
+    while True:
+        ep.check()
+        await ep.wait_rate(prio, cost)
+        await ep.limiter.acquire(prio)
+        try:
+            r = await send()
+        except httpx.TransportError as e:
+            ep.limiter.release(prio)
+            ep.fail()
+            # gönderildikten sonraki hatalar (ReadTimeout, RemoteProtocolError...) tekrarlanmaz:
+            # istek upstream'de işlenmiş olabilir, her tekrar yeni bir üretim ve tam timeout öder
+            if not isinstance(e, _UNSENT) or attempt >= settings.UPSTREAM_MAX_RETRIES:
+                raise
+            await _backoff(attempt, ep.path)
+            attempt += 1
+            continue
+        except BaseException:
+            ep.limiter.release(prio)
+            raise
+        metrics.inc("upstream_responses", endpoint=ep.path, status=str(r.status_code))
+        ep.observe(r)
+        if not _retryable(r.status_code):
+            ep.ok()
+            return r
+        if r.status_code >= 500:
+            ep.fail()
+        if attempt >= settings.UPSTREAM_MAX_RETRIES:
+            return r  # çağıran raise_for_status ile yüzeye çıkarır
+        await discard(r)
+        ep.limiter.release(prio)
+        await _backoff(attempt, ep.path)
+        attempt += 1
+
+async def _noop(r: httpx.Response) -> None:
+    return None
+
+async def call(path: str, send: Callable[[], Awaitable[httpx.Response]], cost: int = 0) -> httpx.Response:
+    ep, prio = _endpoint(path), _priority.get()
+    r = await _open(ep, prio, cost, send, _noop)
+    ep.limiter.release(prio)
+    return r
+
+@asynccontextmanager
+async def stream(path: str, open_cm: Callable[[], object], cost: int = 0) -> AsyncIterator[httpx.Response]:
+    """Stream boyunca slot tutulur; retry yalnızca yanıt başlamadan önce yapılır."""
+    ep, prio = _endpoint(path), _priority.get()
+    cms: list = []
+
+    async def send() -> httpx.Response:
+        cm = open_cm()
+        r = await cm.__aenter__()
+        cms.append(cm)
+        return r
+
+    async def discard(r: httpx.Response) -> None:
+        await r.aread()
+        await cms.pop().__aexit__(None, None, None)
+
+    r = await _open(ep, prio, cost, send, discard)
+    try:
+        yield r
+    finally:
+        try:
+            await cms.pop().__aexit__(None, None, None)
+        finally:
+            ep.limiter.release(prio)
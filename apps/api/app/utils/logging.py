@@ -1,10 +1,88 @@
-import uuid
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        rid = request.headers.get("x-request-id") or str(uuid.uuid4())
-        response = await call_next(request)
-        response.headers["x-request-id"] = rid
-        return response
\ No newline at end of file
+from __future__ import annotations
+import json, logging, time, uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator
+
+logger = logging.getLogger("app.request")
+
+# istek kapsamı: log kayıtları ve upstream çağrıları buradan okur
+request_id: ContextVar[str] = ContextVar("request_id", default="-")
+_timings: ContextVar[Dict[str, float] | None] = ContextVar("timings", default=None)
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """Aktif isteğin `phase` süresine ekler (ms); istek dışında no-op."""
+    t = _timings.get()
+    if t is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t[phase] = t.get(phase, 0.0) + (time.perf_counter() - t0) * 1000
+
+def _server_timing(total_ms: float, phases: Dict[str, float]) -> str:
+    parts = [f"{k};dur={v:.1f}" for k, v in phases.items()]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+# her log kaydına request_id alanı (format'ta %(request_id)s kullanılabilsin)
+_base_factory = logging.getLogRecordFactory()
+
+def _record_factory(*args, **kwargs):
+    rec = _base_factory(*args, **kwargs)
+    rec.request_id = request_id.get()
+    return rec
+
+logging.setLogRecordFactory(_record_factory)
+
+class RequestIDMiddleware:
+    """
+    Saf ASGI middleware: BaseHTTPMiddleware'in task/stream atlaması yok,
+    streaming yanıtlar bozulmaz. x-request-id + Server-Timing başlıklarını
+    ekler, yanıt bitince tek satır yapılandırılmış log yazar.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        rid = None
+        for k, v in scope.get("headers") or ():
+            if k == b"x-request-id":
+                rid = v.decode("latin-1")[:128]
+                break
+        rid = rid or uuid.uuid4().hex
+        phases: Dict[str, float] = {}
+        rid_token = request_id.set(rid)
+        t_token = _timings.set(phases)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                total = (time.perf_counter() - t0) * 1000
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-request-id", rid.encode("latin-1")))
+                headers.append((b"server-timing", _server_timing(total, phases).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            total = (time.perf_counter() - t0) * 1000
+            logger.info(json.dumps({
+                "rid": rid, "method": scope.get("method"), "path": scope.get("path"),
+                "status": status, "total_ms": round(total, 1),
+                **{f"{k}_ms": round(v, 1) for k, v in phases.items()},
+            }))
+            _timings.reset(t_token)
+            request_id.reset(rid_token)
@@ -0,0 +1,37 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+class TTLCache(Generic[V]):
+    """Boyut (LRU) ve yaş (TTL) sınırlı süreç içi cache; ttl=0 süresiz."""
+
+    def __init__(self, maxsize: int, ttl: float = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> V | None:
+        it = self._data.get(key)
+        if it is None:
+            return None
+        ts, val = it
+        if self.ttl and time.monotonic() - ts > self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return val
+
+    def put(self, key: Hashable, val: V) -> None:
+        self._data[key] = (time.monotonic(), val)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Any:
+        return self._data.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,75 @@
+from __future__ import annotations
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+from app.config import settings
+
+# Küçük metrik hook API'si. Çağıranlar prometheus_client'ı bilmez; kapalıyken
+# (METRICS_ENABLED=0) her çağrı tek bir bool kontrolünden ibarettir.
+ENABLED: bool = settings.METRICS_ENABLED
+
+_LATENCY = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+_metrics: Dict[str, object] = {}
+
+if ENABLED:
+    from prometheus_client import (
+        CollectorRegistry, Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest,
+    )
+    _registry = CollectorRegistry()
+
+    def _h(name, doc, labels=(), buckets=_LATENCY):
+        _metrics[name] = Histogram(f"cortexa_{name}", doc, labels, buckets=buckets, registry=_registry)
+
+    def _c(name, doc, labels=()):
+        _metrics[name] = Counter(f"cortexa_{name}", doc, labels, registry=_registry)
+
+    _h("embed_seconds", "Upstream embedding call latency")
+    _h("recall_seconds", "pgvector recall query latency")
+    _h("completion_seconds", "Upstream chat completion latency")
+    _h("ttft_seconds", "Time to first streamed token")
+    _h("db_checkout_seconds", "DB pool checkout wait")
+    _h("embed_batch_size", "Distinct inputs per batched embedding call", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+    _h("prompt_tokens", "Estimated prompt tokens per chat request",
+       buckets=(100, 200, 400, 800, 1200, 1600, 2400, 4000))
+    _h("recall_results", "Memories returned per recall", buckets=(0, 1, 2, 4, 8, 16))
+    _c("upstream_responses", "Upstream responses by status", ("endpoint", "status"))
+    _c("upstream_retries", "Upstream retries", ("endpoint",))
+    _c("upstream_rate_waits", "Calls delayed by the local rate-limit bucket", ("endpoint", "priority"))
+    _c("recall_cache", "Recall cache lookups", ("result",))
+    _c("jobs", "Background job outcomes", ("name", "outcome"))
+    _c("extract", "Fact extraction gate outcomes", ("outcome",))
+    _c("auth", "Auth attempts", ("op", "outcome"))
+
+def observe(name: str, value: float, **labels) -> None:
+    if not ENABLED:
+        return
+    m = _metrics[name]
+    (m.labels(**labels) if labels else m).observe(value)
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    if not ENABLED:
+        return
+    m = _metrics[name]
+    (m.labels(**labels) if labels else m).inc(value)
+
+@contextmanager
+def timer(name: str, **labels) -> Iterator[None]:
+    if not ENABLED:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - t0, **labels)
+
+def gauge_fn(name: str, doc: str, fn: Callable[[], float]) -> None:
+    """Scrape anında okunan gauge (kuyruk derinliği, havuz doluluğu vb.)."""
+    if not ENABLED or name in _metrics:
+        return
+    g = Gauge(f"cortexa_{name}", doc, registry=_registry)
+    g.set_function(fn)
+    _metrics[name] = g
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(_registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,78 @@
+"""
+Kompakt recall (halfvec / kırpılmış boyut + rescoring) vs tam HNSW: recall@k ve gecikme.
+
+    python -m app.memory.compact --dims 512
+    python -m bench.compact_recall -q 200 -k 8 --dims 512
+
+Sorgular mevcut hafızalardan örneklenir (kendi kullanıcısında aranır); doğruluk
+referansı exact (index'siz) sıralamadır. `--json` ile sonuç dosyaya yazılır.
+"""
+from __future__ import annotations
+import argparse, json, time
+import numpy as np
+from sqlalchemy import text
+from app.db.base import get_engine
+from app.memory import repo
+from app.memory.repo import COMPACT_INDEX, HNSW_INDEX, _SEARCH_ANN_SQL, _SEARCH_EXACT_SQL, _search_compact_sql
+
+_SAMPLE_SQL = text("""
+    SELECT user_id::text AS uid, embedding FROM memories TABLESAMPLE SYSTEM (10) LIMIT :n
+""")
+
+def _ids(rows) -> list[str]:
+    return [r.content for r in rows]
+
+def _run(conn, sql, params) -> tuple[list[str], float]:
+    t0 = time.perf_counter()
+    rows = conn.execute(sql, params).all()
+    return _ids(rows), (time.perf_counter() - t0) * 1000
+
+def _pct(xs: list[float], p: float) -> float:
+    return float(np.percentile(xs, p)) if xs else 0.0
+
+def main(queries: int, k: int, dims: int, factors: list[int]) -> dict:
+    variants = {"hnsw_full": (_SEARCH_ANN_SQL, None)}
+    compact_sql = _search_compact_sql(dims)
+    for f in factors:
+        variants[f"compact_{dims}_x{f}"] = (compact_sql, k * f)
+    lat = {name: [] for name in variants}
+    hits = {name: 0 for name in variants}
+    total = 0
+    with get_engine().connect() as conn:
+        sample = conn.execute(_SAMPLE_SQL, {"n": queries}).all()
+        for s in sample:
+            base = {"uid": s.uid, "q": s.embedding, "k": k}
+            truth, _ = _run(conn, _SEARCH_EXACT_SQL, base)
+            total += len(truth)
+            for name, (sql, cand) in variants.items():
+                params = {**base, "cand": cand} if cand else base
+                got, ms = _run(conn, sql, params)
+                lat[name].append(ms)
+                hits[name] += len(set(got) & set(truth))
+        sizes = {r.indexname: r.bytes for r in conn.execute(text("""
+            SELECT indexname, pg_relation_size(indexname::regclass) AS bytes
+            FROM pg_indexes WHERE tablename = 'memories' AND indexname = ANY(:names)
+        """), {"names": [HNSW_INDEX, COMPACT_INDEX]})}
+    out = {"queries": len(sample), "k": k, "metric": repo.DIST_OP, "index_bytes": sizes, "variants": {}}
+    print(f"{'variant':22s} {'recall@k':>9s} {'p50 ms':>8s} {'p95 ms':>8s}")
+    for name in variants:
+        r = hits[name] / total if total else 0.0
+        p50, p95 = _pct(lat[name], 50), _pct(lat[name], 95)
+        out["variants"][name] = {"recall": r, "p50_ms": p50, "p95_ms": p95}
+        print(f"{name:22s} {r:9.3f} {p50:8.2f} {p95:8.2f}")
+    for name, b in sizes.items():
+        print(f"index {name}: {b / 2**20:.1f} MiB")
+    return out
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-q", "--queries", type=int, default=200)
+    ap.add_argument("-k", type=int, default=8)
+    ap.add_argument("--dims", type=int, default=1536)
+    ap.add_argument("--factors", default="2,4,8", help="rescore aday çarpanları")
+    ap.add_argument("--json")
+    args = ap.parse_args()
+    res = main(args.queries, args.k, args.dims, [int(x) for x in args.factors.split(",")])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(res, f, indent=2)
@@ -0,0 +1,67 @@
+"""
+Yerel, OpenAI uyumlu sahte upstream (benchmark/yük testi için):
+
+    MOCK_LATENCY_MS=40 MOCK_TTFT_MS=150 uvicorn bench.mock_llm:app --port 9100
+
+    POST /v1/embeddings        deterministik birim vektörler (metin hash'inden)
+    POST /v1/chat/completions  sabit cevap; `stream: true` ise SSE parçaları
+"""
+from __future__ import annotations
+import asyncio, hashlib, json, os, time
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+DIM = int(os.getenv("MOCK_DIM", "1536"))
+LATENCY = float(os.getenv("MOCK_LATENCY_MS", "40")) / 1000      # embedding / non-stream gecikmesi
+TTFT = float(os.getenv("MOCK_TTFT_MS", "150")) / 1000           # ilk token gecikmesi
+TOKEN_GAP = float(os.getenv("MOCK_TOKEN_MS", "15")) / 1000      # token arası
+TOKENS = int(os.getenv("MOCK_TOKENS", "40"))
+EXTRACT = os.getenv("MOCK_EXTRACT", "1") == "1"                 # extraction çağrılarına fact dön
+
+app = FastAPI(title="mock-llm")
+
+def _vec(t: str) -> list[float]:
+    seed = int.from_bytes(hashlib.sha256(t.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+    return (v / np.linalg.norm(v)).tolist()
+
+@app.post("/v1/embeddings")
+async def embeddings(req: Request):
+    body = await req.json()
+    inp = body["input"]
+    texts = [inp] if isinstance(inp, str) else list(inp)
+    await asyncio.sleep(LATENCY)
+    return {"object": "list", "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": _vec(t)} for i, t in enumerate(texts)]}
+
+def _is_extract(messages: list[dict]) -> bool:
+    return any(m.get("role") == "system" and "extract" in (m.get("content") or "").lower() for m in messages)
+
+def _answer(messages: list[dict]) -> str:
+    if _is_extract(messages):
+        if not EXTRACT:
+            return "[]"
+        user = next((m["content"] for m in reversed(messages) if m.get("role") == "user"), "")
+        return json.dumps([{"kind": "note", "content": f"Bench fact: {user[-60:]}", "score": 0.9}])
+    return " ".join(f"tok{i}" for i in range(TOKENS))
+
+@app.post("/v1/chat/completions")
+async def chat(req: Request):
+    body = await req.json()
+    text = _answer(body.get("messages") or [])
+    if not body.get("stream"):
+        await asyncio.sleep(LATENCY + TTFT)
+        return {"id": "mock", "object": "chat.completion", "created": int(time.time()),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}]}
+
+    async def events():
+        await asyncio.sleep(TTFT)
+        for i, tok in enumerate(text.split(" ")):
+            chunk = {"choices": [{"index": 0, "delta": {"content": tok if i == 0 else " " + tok}}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(TOKEN_GAP)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -0,0 +1,56 @@
+"""
+pgvector parametre kodlaması mikro-benchmark'ı: metin literal vs binary.
+
+    python -m bench.vector_codec            # sadece istemci tarafı kodlama
+    python -m bench.vector_codec --db       # + DATABASE_URL üzerinde round-trip
+"""
+from __future__ import annotations
+import argparse, os, random, struct, time
+import numpy as np
+from app.db import vector
+
+DIM = 1536
+
+def _binary_wire(arr: np.ndarray) -> bytes:
+    # pgvector binary formatı: int16 dim, int16 unused, float32[] (big-endian)
+    return struct.pack(">HH", arr.shape[0], 0) + arr.astype(">f4").tobytes()
+
+def _bench(fn, n: int) -> float:
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6  # µs/op
+
+def bench_encode(n: int) -> None:
+    emb = [random.uniform(-1, 1) for _ in range(DIM)]
+    text_us = _bench(lambda: vector.to_literal(emb), n)
+    bin_us = _bench(lambda: _binary_wire(vector.to_param(emb)), n)
+    text_len = len(vector.to_literal(emb).encode())
+    bin_len = len(_binary_wire(vector.to_param(emb)))
+    print(f"encode  text   {text_us:9.1f} µs/op  {text_len:6d} B")
+    print(f"encode  binary {bin_us:9.1f} µs/op  {bin_len:6d} B  ({text_us / bin_us:.1f}x)")
+
+def bench_db(n: int) -> None:
+    import psycopg
+    url = os.getenv("DATABASE_URL", "").replace("postgresql+psycopg://", "postgresql://")
+    emb = [random.uniform(-1, 1) for _ in range(DIM)]
+    with psycopg.connect(url) as conn:
+        vector._register(conn)
+        lit = lambda: conn.execute("SELECT %s::vector <-> %s::vector",
+                                   (vector.to_literal(emb), vector.to_literal(emb))).fetchone()
+        arr = lambda: conn.execute("SELECT %b <-> %b",
+                                   (vector.to_param(emb), vector.to_param(emb))).fetchone()
+        lit(); arr()  # ısınma
+        text_us = _bench(lit, n)
+        bin_us = _bench(arr, n)
+    print(f"db      text   {text_us:9.1f} µs/op")
+    print(f"db      binary {bin_us:9.1f} µs/op  ({text_us / bin_us:.1f}x)")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("-n", type=int, default=2000)
+    ap.add_argument("--db", action="store_true")
+    args = ap.parse_args()
+    bench_encode(args.n)
+    if args.db:
+        bench_db(max(1, args.n // 10))
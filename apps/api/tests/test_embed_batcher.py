@@ -0,0 +1,55 @@
+import asyncio
+from app.memory.embeddings import _Batcher
+from app.upstream import gateway
+
+def _recording_fetch(seen):
+    async def fetch(texts):
+        seen.append((list(texts), gateway.is_background()))
+        return [[float(len(t))] for t in texts]
+    return fetch
+
+def test_mixed_batch_goes_out_at_user_priority():
+    async def main():
+        seen = []
+        b = _Batcher(_recording_fetch(seen), window=0.01, max_size=64)
+
+        async def bg_embed():
+            with gateway.background():
+                return await b.embed(["fact from auto memory"])
+
+        bg = asyncio.create_task(bg_embed())
+        await asyncio.sleep(0)  # arka plan işi pencereyi açsın
+        user = await b.embed(["user message"])
+        await bg
+        return seen, user
+
+    seen, user = asyncio.run(main())
+    assert user == [[12.0]]
+    assert len(seen) == 1
+    assert sorted(seen[0][0]) == ["fact from auto memory", "user message"]
+    assert seen[0][1] is False
+
+def test_background_only_batch_stays_background():
+    async def main():
+        seen = []
+        b = _Batcher(_recording_fetch(seen), window=0.01, max_size=64)
+        with gateway.background():
+            await asyncio.gather(b.embed(["a"]), b.embed(["b"]))
+        return seen
+
+    seen = asyncio.run(main())
+    assert len(seen) == 1 and seen[0][1] is True
+
+def test_user_batch_not_background_when_flushed_by_size():
+    async def main():
+        seen = []
+        b = _Batcher(_recording_fetch(seen), window=10, max_size=2)
+        with gateway.background():
+            t = asyncio.create_task(b.embed(["x"]))
+        await asyncio.sleep(0)
+        await b.embed(["y"])
+        await t
+        return seen
+
+    seen = asyncio.run(main())
+    assert seen[0][1] is False
@@ -0,0 +1,38 @@
+import pytest
+from app.memory.extract import has_signal
+
+@pytest.mark.parametrize("msg", [
+    "I have two kids and a dog",
+    "I moved to Berlin last year",
+    "I use vim at work every day",
+    "I was born in 1990",
+    "I work at a bank",
+    "Mühendisim",
+    "hastayım",
+    "Doktorum, İzmir'de oturuyorum",
+    "Benim adım Ayşe",
+    "28 yaşındayım",
+    "Öğretmenim.",
+    "yazılım geliştiricisiyim",
+])
+def test_self_disclosures_pass(msg):
+    assert has_signal(msg)
+
+@pytest.mark.parametrize("msg", [
+    "ok",
+    "teşekkürler!",
+    "Thanks",
+    "how do you sort a list in python?",
+    "what is the capital of France",
+    "what is the premium plan price",
+    "explain the minimum spanning tree algorithm",
+    "tell me about the museum",
+    "Python forum öner",
+    "bu durumda çözüm nedir",
+    "resim nasıl çizilir",
+    "what is ai",
+    "how does ml work",
+    "",
+])
+def test_small_talk_and_questions_skip(msg):
+    assert not has_signal(msg)
@@ -0,0 +1,72 @@
+import httpx
+from app.upstream import gateway
+
+def _resp(**headers):
+    return httpx.Response(200, headers=headers)
+
+def test_bucket_paces_by_refill_rate():
+    ep = gateway._Endpoint("/chat/completions", 4)
+    # 1000 tokenlık kotanın 400'ü kalmış, açık 6 sn'de kapanıyor -> 100 token/sn
+    ep.observe(_resp(**{"x-ratelimit-limit-tokens": "1000", "x-ratelimit-remaining-tokens": "400",
+                        "x-ratelimit-reset-tokens": "6s"}))
+    assert ep.tokens.rate == 100.0
+    assert ep.tokens.debit(300) == 0.0
+    wait = ep.tokens.debit(300)  # bakiye -200 -> ~2 sn
+    assert 1.9 < wait <= 2.0
+
+def test_background_keeps_request_reserve():
+    ep = gateway._Endpoint("/embeddings", 4)
+    ep.observe(_resp(**{"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "25",
+                        "x-ratelimit-reset-requests": "45s"}))
+    assert ep.requests.debit(1, reserve=20) == 0.0
+    assert ep.requests.debit(5, reserve=20) > 0.0
+
+def test_no_headers_no_pacing():
+    ep = gateway._Endpoint("/embeddings", 4)
+    assert ep.tokens.debit(10_000) == 0.0
+
+def test_estimate_tokens():
+    body = {"messages": [{"role": "user", "content": "x" * 400}], "max_tokens": 50}
+    assert gateway.estimate_tokens(body) == 150
+    assert gateway.estimate_tokens({"input": ["abcd", "efgh"]}) == 2
+
+def test_half_open_lets_one_probe_through(monkeypatch):
+    import pytest
+    from app.config import settings
+    monkeypatch.setattr(settings, "UPSTREAM_BREAKER_COOLDOWN", 0.0)
+    ep = gateway._Endpoint("/chat/completions", 4)
+    for _ in range(settings.UPSTREAM_BREAKER_FAILURES):
+        ep.fail()
+    ep.check()  # cooldown bitti: deneme isteği
+    with pytest.raises(gateway.UpstreamUnavailable):
+        ep.check()
+    ep.ok()
+    ep.check()
+    ep.check()
+
+def test_sent_requests_are_not_retried():
+    import asyncio, pytest
+    calls = []
+
+    async def send():
+        calls.append(1)
+        raise httpx.ReadTimeout("slow")
+
+    with pytest.raises(httpx.ReadTimeout):
+        asyncio.run(gateway.call("/test-read-timeout", send))
+    assert len(calls) == 1
+
+def test_connect_errors_are_retried(monkeypatch):
+    import asyncio
+    from app.config import settings
+    monkeypatch.setattr(settings, "UPSTREAM_RETRY_BASE_DELAY", 0.0)
+    calls = []
+
+    async def send():
+        calls.append(1)
+        if len(calls) == 1:
+            raise httpx.ConnectError("refused")
+        return httpx.Response(200)
+
+    r = asyncio.run(gateway.call("/test-connect", send))
+    assert r.status_code == 200 and len(calls) == 2
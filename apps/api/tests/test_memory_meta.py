@@ -0,0 +1,57 @@
+from app.memory.repo import clean_meta, _row_params
+from app.memory.bulk import parse_line
+
+def test_reserved_keys_are_coerced_or_dropped():
+    out = clean_meta({"score": "high", "seen": "3", "hits": -2, "last_seen": "yesterday",
+                      "last_hit": "2025-01-02T03:04:05+00:00", "merged": True, "tag": "x"})
+    assert "score" not in out and "last_seen" not in out and "merged" not in out
+    assert out["seen"] == 3 and out["hits"] == 0
+    assert out["last_hit"] == "2025-01-02T03:04:05+00:00"
+    assert out["tag"] == "x"
+
+def test_score_is_clamped():
+    assert clean_meta({"score": 7})["score"] == 1.0
+    assert "score" not in clean_meta({"score": float("nan")})
+
+def test_row_params_tolerates_bad_score():
+    p = _row_params("u", {"kind": "note", "content": "c", "emb": [0.0], "meta": {"score": "high"}})
+    assert p["score"] == 0.0
+
+def test_import_line_meta_is_cleaned():
+    row = parse_line(b'{"content": "I live in Izmir", "meta": {"score": "high", "hits": "2"}}')
+    assert row["meta"] == {"source": "import", "hits": 2}
+
+def test_batch_near_duplicates_collapse_to_newest():
+    import numpy as np
+    from app.memory.repo import _collapse
+    a = {"c": "Kullanıcı 28 yaşında", "e": np.array([1.0, 0.0], dtype=np.float32), "score": 0.9}
+    b = {"c": "Kullanıcı 29 yaşında", "e": np.array([1.0, 0.05], dtype=np.float32), "score": 0.7}
+    c = {"c": "Kullanıcı kedi sever", "e": np.array([0.0, 1.0], dtype=np.float32), "score": 0.6}
+    out = _collapse([a, b, c], 0.25)
+    assert [p["c"] for p in out] == ["Kullanıcı 29 yaşında", "Kullanıcı kedi sever"]
+    assert out[0]["score"] == 0.9
+
+def test_import_line_rejects_bad_embeddings():
+    import pytest
+    for raw in (b'{"content": "x", "embedding": {"a": 1}}',
+                b'{"content": "x", "embedding": [{"a": 1}, {"b": 2}]}',
+                b'{"content": "x", "embedding": [' + b", ".join([b"NaN"] + [b"0"] * 1535) + b']}'):
+        with pytest.raises(ValueError):
+            parse_line(raw)
+
+def test_counts_fit_in_int4():
+    out = clean_meta({"hits": 10**12, "seen": "99999999999", "merged": 2**31})
+    assert out == {"hits": 2**31 - 1, "seen": 2**31 - 1, "merged": 2**31 - 1}
+
+def test_same_fact_threshold_is_metric_independent(monkeypatch):
+    import numpy as np
+    from app.config import settings
+    from app.memory.repo import _collapse, metric_dist
+    # cos = 0.8: farklı fact'ler ("likes cats" / "likes dogs"), hiçbir metrikte birleşmemeli
+    cats = {"c": "likes cats", "e": np.array([1.0, 0.0], dtype=np.float32), "score": 0.5}
+    dogs = {"c": "likes dogs", "e": np.array([0.8, 0.6], dtype=np.float32), "score": 0.5}
+    for metric in ("l2", "cosine"):
+        monkeypatch.setattr(settings, "RECALL_METRIC", metric)
+        assert len(_collapse([cats, dogs], metric_dist(0.25))) == 2
+    monkeypatch.setattr(settings, "RECALL_METRIC", "cosine")
+    assert metric_dist(0.25) == 0.03125
@@ -0,0 +1,24 @@
+from collections import namedtuple
+from app.config import settings
+from app.memory.repo import _memories, lexical_query
+
+Row = namedtuple("Row", "id content meta created_at dist lr")
+
+def test_generic_chat_has_no_lexical_query():
+    assert lexical_query("How are you doing today? Can you help me with this") is None
+    assert lexical_query("merhaba, nasılsın? bugün bana yardım eder misin") is None
+
+def test_specific_tokens_survive():
+    q = lexical_query("Benim adım Ahmet, 25 yaşındayım ve Acme'de çalışıyorum")
+    terms = q.split(" | ")
+    assert {"Ahmet", "25", "Acme"} <= set(terms)
+    assert "Benim" not in terms
+
+def test_lexical_only_rows_use_relaxed_cutoff():
+    md = 0.8
+    near = Row(1, "a", {}, None, md * 1.1, 1)
+    far = Row(2, "b", {}, None, md * settings.RECALL_LEXICAL_DIST_SLACK + 0.1, 1)
+    vec_only = Row(3, "c", {}, None, md * 1.1, None)
+    out = _memories([near, far, vec_only], md)
+    assert [m.content for m in out] == ["a"]
+    assert out[0].dist == md * 1.1
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from app.memory.retention import _merged_meta
+
+def _row(id, content, created, meta):
+    return SimpleNamespace(id=id, content=content, created_at=created, meta=meta)
+
+def test_survivor_is_most_recent_without_llm():
+    old = _row("a", "User is 28 years old", datetime(2025, 1, 1, tzinfo=timezone.utc),
+               {"score": 0.9, "seen": 5, "hits": 3})
+    new = _row("b", "User is 29 years old", datetime(2025, 6, 1, tzinfo=timezone.utc),
+               {"score": 0.6, "seen": 1})
+    keep, meta = _merged_meta([old, new])
+    assert keep.id == "b"
+    assert meta["score"] == 0.9 and meta["seen"] == 6 and meta["hits"] == 3 and meta["merged"] == 2
+
+def test_last_seen_counts_as_recent_contact():
+    seen = _row("a", "User lives in Izmir", datetime(2025, 1, 1, tzinfo=timezone.utc),
+                {"last_seen": "2025-09-01T00:00:00"})
+    made = _row("b", "User lives in İzmir", datetime(2025, 6, 1, tzinfo=timezone.utc), {})
+    keep, meta = _merged_meta([seen, made])
+    assert keep.id == "a"
+    assert meta["last_seen"].startswith("2025-09-01")
+
+def test_llm_merge_keeps_heaviest_row():
+    old = _row("a", "x", datetime(2025, 1, 1, tzinfo=timezone.utc), {"score": 0.9})
+    new = _row("b", "y", datetime(2025, 6, 1, tzinfo=timezone.utc), {"score": 0.2})
+    assert _merged_meta([old, new], by_recency=False)[0].id == "a"
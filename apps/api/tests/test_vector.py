@@ -0,0 +1,16 @@
+import numpy as np
+from pgvector.psycopg.vector import VectorBinaryDumper, VectorDumper
+from app.db import vector
+
+def test_binary_roundtrip_returns_ndarray():
+    emb = vector.to_param([0.25, -1.5, 3.0])
+    out = vector.NdarrayBinaryLoader(0).load(VectorBinaryDumper(np.ndarray).dump(emb))
+    assert isinstance(out, np.ndarray)
+    assert out.dtype == np.float32
+    np.testing.assert_array_equal(out, emb)
+
+def test_text_roundtrip_returns_ndarray():
+    emb = vector.to_param([0.5, 2.0])
+    out = vector.NdarrayLoader(0).load(VectorDumper(np.ndarray).dump(emb))
+    assert isinstance(out, np.ndarray)
+    np.testing.assert_allclose(out, emb)
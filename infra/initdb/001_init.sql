@@ -15,8 +15,54 @@ CREATE TABLE IF NOT EXISTS memories (
   content TEXT NOT NULL,
   embedding vector(1536),
   meta JSONB DEFAULT '{}'::jsonb,
-  created_at TIMESTAMPTZ DEFAULT now()
+  created_at TIMESTAMPTZ DEFAULT now(),
+  content_hash TEXT
 );
 
 CREATE INDEX IF NOT EXISTS idx_mem_user ON memories(user_id);
-CREATE INDEX IF NOT EXISTS idx_mem_vec ON memories USING ivfflat (embedding vector_cosine_ops);
\ No newline at end of file
+CREATE UNIQUE INDEX IF NOT EXISTS uq_mem_user_hash ON memories(user_id, content_hash);
+-- metric uygulamadaki RECALL_METRIC (varsayılan l2) ile aynı olmalı
+CREATE INDEX IF NOT EXISTS idx_mem_embed_hnsw ON memories USING hnsw (embedding vector_l2_ops) WITH (m = 16, ef_construction = 64);
+-- hybrid recall'un full-text indexi RECALL_HYBRID=1 ile migration/reindex tarafından kurulur
+CREATE TABLE IF NOT EXISTS embedding_cache (
+  model TEXT NOT NULL,
+  text_hash TEXT NOT NULL,
+  embedding vector NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (model, text_hash)
+);
+
+CREATE TABLE IF NOT EXISTS jobs (
+  id BIGSERIAL PRIMARY KEY,
+  name TEXT NOT NULL,
+  payload JSONB NOT NULL,
+  status TEXT NOT NULL DEFAULT 'queued',
+  attempts INT NOT NULL DEFAULT 0,
+  error TEXT,
+  run_after TIMESTAMPTZ NOT NULL DEFAULT now(),
+  locked_until TIMESTAMPTZ,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queued ON jobs(id) WHERE status = 'queued';
+CREATE INDEX IF NOT EXISTS idx_jobs_running ON jobs(locked_until) WHERE status = 'running';
+
+CREATE TABLE IF NOT EXISTS conversations (
+  id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+  user_id UUID NOT NULL,
+  summary TEXT NOT NULL DEFAULT '',
+  summarized_upto INT NOT NULL DEFAULT 0,
+  turn_count INT NOT NULL DEFAULT 0,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS idx_conv_user ON conversations(user_id, updated_at DESC);
+
+CREATE TABLE IF NOT EXISTS conversation_turns (
+  conversation_id UUID NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+  seq INT NOT NULL,
+  role TEXT NOT NULL,
+  content TEXT NOT NULL,
+  created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (conversation_id, seq)
+);